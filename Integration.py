@@ -1,10 +1,17 @@
+import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from ZohoCRMAutomatedAuth import ZohoCRMAutomatedAuth
-from helper import excel_to_json, assign_sales_person_to_areas, separate_and_store_temp, assgin_leads_to_lead_name, compare_and_update_excel
+from helper import excel_types, assign_sales_person_frame, separate_records, create_leads_from_frame, compare_and_update_frame
 
-def lead_import(file_path):
+def lead_import(file_path=None, records=None):
+    """Import one export into Zoho; pass records (the export as read_excel loads it) to skip reading file_path."""
     try: 
-        update_success, update_data = compare_and_update_excel(new_file=file_path)        
-        if not update_success:
+        if records is None:
+            records = pd.read_excel(file_path)
+        source_name = os.path.basename(file_path) if file_path else "input_file.xlsx"
+        new_entries, update_data = compare_and_update_frame(records)        
+        if new_entries is None:
             return {
                 "message": "No new records to process. Excel file is up to date.",
                 "statusCode": 200,
@@ -13,30 +20,37 @@ def lead_import(file_path):
             }        
         crm = ZohoCRMAutomatedAuth() 
         if crm.test_api_connection():
-            matched_file_path, analysis_data = separate_and_store_temp(file_path, True)   
-            if not matched_file_path:
+            matched_df, _, analysis_data = separate_records(new_entries, True, source_name)   
+            if matched_df is None:
                 return {
                     "message": "Failed to separate records.",
                     "statusCode": 400,
                     "status": False,
                     "analysis_data": {}
                 }
-            area_result = assign_sales_person_to_areas(
-                excel_file_path=matched_file_path,
+            area_result = assign_sales_person_frame(
+                matched_df,
                 area_column_name="Area Name", 
-                sales_person_column_name="Sales Person"
+                sales_person_column_name="Sales Person",
+                original_file_name=source_name
             )
-            if isinstance(area_result, dict):
-                analysis_data['unmatched_areas'] = area_result.get('unmatched_areas', [])
-                matched_file_path = area_result.get('matched_file_path', matched_file_path)
-            else:
-                matched_file_path = area_result            
+            analysis_data['unmatched_areas'] = area_result.get('unmatched_areas', [])
+            analysis_data['fuzzy_matched_areas'] = area_result.get('fuzzy_matched_areas', [])
             analysis_data.update(update_data)            
-            records = excel_to_json(matched_file_path)            
-            if records: 
-                cmda_success = crm.push_records_to_zoho(records)
-                leads_success = assgin_leads_to_lead_name(area_result.get('matched_file_path', matched_file_path), crm)  
+            # Column types as the matched workbook used to be read back with, without writing it.
+            leads_df = excel_types(area_result['matched_df'])
+            if not leads_df.empty: 
+                # CMDA-module and Leads batches share the scheduler's concurrency limit.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    cmda_future = executor.submit(crm.push_records_to_zoho, leads_df)
+                    leads_future = executor.submit(create_leads_from_frame, leads_df, crm)
+                    cmda_success = cmda_future.result()
+                    leads_success = leads_future.result() is not None
                 print(f"CMDA Success: {cmda_success}, Leads Success: {leads_success}")   
+                analysis_data['crm_throughput'] = crm.scheduler.throughput()
+                analysis_data['token_stats'] = crm.token_manager.snapshot()
+                for module, module_stats in analysis_data['crm_throughput'].items():
+                    print(f"📈 {module}: {module_stats['records']} records in {module_stats['seconds']}s ({module_stats['records_per_second']} records/s)")
                 if cmda_success and leads_success:
                     return {
                         "message": "Records pushed to CMDA and Leads created successfully!",
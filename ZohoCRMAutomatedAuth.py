@@ -1,14 +1,20 @@
-import re
+import io
 import os
+import csv
 import json
+import zipfile
 import time
-import requests
 import traceback
 import pandas as pd
 from dotenv import load_dotenv
+from http_client import get_session
+from zoho_scheduler import ZohoPushScheduler
+from token_broker import get_token_source
+from outbox import get_outbox
+from zoho_formatter import LEAD_FIELD_DEFAULTS, records_to_frame, format_cmda_records, build_lead_records
 from selenium import webdriver
 from datetime import datetime, timedelta
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
@@ -17,6 +23,16 @@ from selenium.common.exceptions import TimeoutException, WebDriverException, Ele
 from selenium.webdriver.common.action_chains import ActionChains
 load_dotenv()
 
+ZOHO_VERIFY_LEADS = os.getenv("ZOHO_VERIFY_LEADS", "false").lower() in ("1", "true", "yes")
+ZOHO_BULK_WRITE_THRESHOLD = int(os.getenv("ZOHO_BULK_WRITE_THRESHOLD", "1000"))
+ZOHO_BULK_POLL_SECONDS = float(os.getenv("ZOHO_BULK_POLL_SECONDS", "10"))
+ZOHO_BULK_TIMEOUT_SECONDS = float(os.getenv("ZOHO_BULK_TIMEOUT_SECONDS", "1800"))
+BULK_WRITE_SUCCESS_STATUSES = {"ADDED", "UPDATED"}
+ZOHO_UPSERT_ENABLED = os.getenv("ZOHO_UPSERT_ENABLED", "true").lower() in ("1", "true", "yes")
+CMDA_UPSERT_FIELD = os.getenv("CMDA_UPSERT_FIELD", "Plan_Permission")
+LEADS_UPSERT_FIELD = os.getenv("LEADS_UPSERT_FIELD", "Planning_Permission_No")
+UPSERT_PLACEHOLDER_VALUES = {"", "failed", "not found", "error", "nan", "n/a"}
+
 class ZohoCRMAutomatedAuth:
 
     def __init__(self):
@@ -34,6 +50,9 @@ class ZohoCRMAutomatedAuth:
         self.refresh_token = None
         self.token_expires_at = None
         self.token_file = os.getenv("TOKEN_FILE_NAME")
+        self.session = get_session("zoho")
+        self.scheduler = ZohoPushScheduler()
+        self.token_manager = get_token_source(self)
     
     def truncate_field(self, value, max_length):
         """Truncate string to max_length, adding '...' if truncated."""
@@ -557,7 +576,7 @@ class ZohoCRMAutomatedAuth:
         }
         
         try:
-            response = requests.post(self.token_url, data=data)
+            response = self.session.post(self.token_url, data=data)
             print(f"Token request status: {response.status_code}")
             
             if response.status_code == 200:
@@ -593,7 +612,7 @@ class ZohoCRMAutomatedAuth:
         }
         
         try:
-            response = requests.post(self.token_url, data=data)
+            response = self.session.post(self.token_url, data=data)
             print(f"Refresh request status: {response.status_code}")
             
             if response.status_code == 200:
@@ -622,8 +641,10 @@ class ZohoCRMAutomatedAuth:
         }
         
         try:
-            with open(self.token_file, 'w') as f:
+            temp_file = f"{self.token_file}.tmp"
+            with open(temp_file, 'w') as f:
                 json.dump(token_data, f, indent=2)
+            os.replace(temp_file, self.token_file)
             print(f"✓ Tokens saved to {self.token_file}")
             return True
         except Exception as e:
@@ -655,25 +676,30 @@ class ZohoCRMAutomatedAuth:
     
     def ensure_valid_token(self):
         try:
-            print("Ensuring valid access token...")            
-            if not self.access_token:
-                self.load_tokens()              
-            if self.token_expires_at and datetime.now() >= self.token_expires_at:
-                print("Token expired, attempting refresh...")
-                if not self.refresh_access_token():
-                    print("Token refresh failed, starting OAuth flow...")
-                    return self.automate_oauth_flow()
-                return True                    
-            if not self.access_token:
-                print("No access token found, starting OAuth flow...")
-                return self.automate_oauth_flow()
-            
-            print("✓ Access token is valid")
+            token = self.token_manager.get_token()
+            if not token:
+                print("❌ No valid access token available")
+                return False
+            self.access_token = token
             return True
         except Exception as e:
             print(f"❌ Error in ensure_valid_token: {str(e)}") 
             return False
 
+    def authorized_request(self, method, url, headers=None, **kwargs):
+        """Send with the token source's current token; a 401 invalidates it and retries once with a refreshed one."""
+        token = self.token_manager.get_token() or self.access_token
+        response = self.session.request(method, url, headers={**(headers or {}), 'Authorization': f'Zoho-oauthtoken {token}'}, **kwargs)
+        if response.status_code == 401 and token:
+            print("🔑 Zoho rejected the access token, refreshing and retrying once...")
+            self.token_manager.invalidate(token)
+            token = self.token_manager.get_token()
+            if token:
+                response = self.session.request(method, url, headers={**(headers or {}), 'Authorization': f'Zoho-oauthtoken {token}'}, **kwargs)
+        if token:
+            self.access_token = token
+        return response
+
     def validate_record_for_zoho(self, formatted_record):
         """Validate record fields against Zoho constraints."""
         errors = []        
@@ -685,182 +711,232 @@ class ZohoCRMAutomatedAuth:
             errors.append(f"Invalid email format: {email}")        
         return errors
 
-    def format_record_for_zoho(self, record):
-        formatted_record = {}
-        field_mapping = {
-            "Sales Person": "Lead_Owner", 
-            "Email ID": "Email",
-            "Mobile No.": "Mobile_Number",
-            "Date of permit": "Date_of_Permit",
-            "Applicant Name": "Lead_Name",
-            "Nature of Development": "Nature_of_Developments",
-            "Dwelling Unit Info": "Dwelling_Unit_Info",
-            "Reference": "Reference",
-            "Company_Name": "Company_Name",
-            "Architect Name": "Architect",
-            "Planning Permission No.": "Plan_Permission",
-            "Applicant Address": "Applicant_Address",
-            "Future_Projects": "Future_Project", 
-            "Creation_Time": "Creation_Time",
-            "Which_Brand_Looking_for": "Which_Brand_Looking_for",
-            "How_Much_Square_Feet": "How_Much_Square_Feet",
-            "Area Name": "Area_Name",  
-            "Site Address": "Site_Address"
-        }                
+    def upsert_field_for(self, record, field):
+        """The duplicate-check field to upsert on, or None when the record has no real Planning Permission No."""
+        if not ZOHO_UPSERT_ENABLED:
+            return None
+        value = record.get(field)
+        if value is None or str(value).strip().lower() in UPSERT_PLACEHOLDER_VALUES:
+            return None
+        return field
+
+    def group_into_batches(self, indexed_records, field, batch_size):
+        """Split (index, record) pairs into (indexes, records, upsert_field) batches, keeping upserts and inserts apart."""
+        groups = {}
+        for index, record in indexed_records:
+            groups.setdefault(self.upsert_field_for(record, field), []).append((index, record))
+        batches = []
+        for upsert_field, group in groups.items():
+            for start in range(0, len(group), batch_size):
+                chunk = group[start:start + batch_size]
+                batches.append(([index for index, _ in chunk], [record for _, record in chunk], upsert_field))
+        return batches
+
+    def record_write_url(self, module, upsert_field):
+        return f"{self.api_base_url}/{module}/upsert" if upsert_field else f"{self.api_base_url}/{module}"
+
+    def record_write_payload(self, records, upsert_field, trigger):
+        payload = {'data': records, 'trigger': trigger}
+        if upsert_field:
+            payload['duplicate_check_fields'] = [upsert_field]
+        return payload
+
+    def bulk_write_urls(self):
+        parsed = urlparse(self.api_base_url)
+        domain = f"{parsed.scheme}://{parsed.netloc}"
+        content_domain = f"{parsed.scheme}://{parsed.netloc.replace('www.', 'content.', 1)}"
+        upload_url = os.getenv("ZOHO_BULK_UPLOAD_URL", f"{content_domain}/crm/v2/upload")
+        write_url = os.getenv("ZOHO_BULK_WRITE_URL", f"{domain}/crm/bulk/v2/write")
+        return upload_url, write_url
+
+    def build_bulk_write_zip(self, module, records):
+        field_names = []
+        for record in records:
+            for key in record:
+                if key not in field_names:
+                    field_names.append(key)
+        csv_buffer = io.StringIO()
+        writer = csv.DictWriter(csv_buffer, fieldnames=field_names, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr(f"{module}.csv", csv_buffer.getvalue().encode("utf-8"))
+        return zip_buffer.getvalue(), field_names
+
+    def bulk_write_records(self, module, records, upsert_field=None):
+        """Insert (or upsert on upsert_field) records through the Bulk Write API; one result per record, in input order."""
+        results = [{"status": "error", "id": None, "message": "Not processed by bulk job"} for _ in records]
+        if not records:
+            return results
+        if not self.ensure_valid_token():
+            for result in results:
+                result["message"] = "Unable to ensure valid access token"
+            return results
+        upload_url, write_url = self.bulk_write_urls()
         try:
-            dwelling_units = record.get("Dwelling Unit Info")
-            if dwelling_units is not None and not pd.isna(dwelling_units):
-                dwelling_str = str(dwelling_units).strip()
-                if dwelling_str and dwelling_str != '' and dwelling_str.lower() != 'nan':
-                    try:
-                        numbers = re.findall(r'\d+', dwelling_str)
-                        if numbers:
-                            dwelling_value = int(numbers[0])
-                            bathrooms = dwelling_value * 2
-                            formatted_record["No_of_bathrooms"] = str(bathrooms)
-                        else:
-                            formatted_record["No_of_bathrooms"] = "0"
-                    except (ValueError, TypeError) as e:
-                        formatted_record["No_of_bathrooms"] = "0"
+            zip_bytes, field_names = self.build_bulk_write_zip(module, records)
+            print(f"📦 Uploading {len(records)} {module} records for bulk write...")
+            response = self.scheduler.send(module, lambda: self.authorized_request(
+                "POST", upload_url,
+                headers={'feature': 'bulk-write', 'X-CRM-ORG': self.org_id},
+                files={'file': (f"{module}.zip", zip_bytes, 'application/zip')}
+            ), 0)
+            if response.status_code != 200:
+                raise RuntimeError(f"Bulk upload failed ({response.status_code}): {response.text}")
+            file_id = response.json()['details']['file_id']
+            field_mappings = []
+            for index, name in enumerate(field_names):
+                mapping = {"api_name": name, "index": index}
+                if name == "Owner":
+                    mapping["find_by"] = "id"
+                field_mappings.append(mapping)
+            resource = {"type": "data", "module": module, "file_id": file_id, "field_mappings": field_mappings}
+            if upsert_field:
+                resource["find_by"] = upsert_field
+            job = {
+                "operation": "upsert" if upsert_field else "insert",
+                "ignore_empty": True,
+                "character_encoding": "UTF-8",
+                "resource": [resource]
+            }
+            response = self.scheduler.send(module, lambda: self.authorized_request(
+                "POST", write_url, json=job, headers={'Content-Type': 'application/json'}
+            ), len(records))
+            if response.status_code not in (200, 201):
+                raise RuntimeError(f"Bulk write job rejected ({response.status_code}): {response.text}")
+            job_id = response.json()['details']['id']
+            print(f"🕒 Bulk write job {job_id} submitted, polling for completion...")
+            deadline = time.time() + ZOHO_BULK_TIMEOUT_SECONDS
+            while True:
+                response = self.authorized_request("GET", f"{write_url}/{job_id}")
+                response.raise_for_status()
+                job_status = response.json()
+                status = job_status.get('status')
+                if status == "COMPLETED":
+                    break
+                if status == "FAILED":
+                    raise RuntimeError(f"Bulk write job {job_id} failed: {job_status}")
+                if time.time() > deadline:
+                    raise RuntimeError(f"Bulk write job {job_id} still {status} after {ZOHO_BULK_TIMEOUT_SECONDS:.0f}s")
+                time.sleep(ZOHO_BULK_POLL_SECONDS)
+            download_url = urljoin(write_url, job_status['result']['download_url'])
+            response = self.authorized_request("GET", download_url)
+            response.raise_for_status()
+            with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+                result_csv = zip_file.read(zip_file.namelist()[0]).decode("utf-8-sig")
+            # The result file lists the uploaded rows in upload order with STATUS, RECORD_ID and ERRORS appended.
+            for result, row in zip(results, csv.DictReader(io.StringIO(result_csv))):
+                row_status = (row.get("STATUS") or "").upper()
+                if row_status in BULK_WRITE_SUCCESS_STATUSES:
+                    result.update({"status": "success", "id": row.get("RECORD_ID"), "message": row_status})
                 else:
-                    formatted_record["No_of_bathrooms"] = "0"
-            else:
-                formatted_record["No_of_bathrooms"] = "0"
+                    result["message"] = row.get("ERRORS") or row_status or "Unknown error"
         except Exception as e:
-            traceback.print_exc()
-            formatted_record["No_of_bathrooms"] = "0"        
-        for excel_field, zoho_field in field_mapping.items():
-            if excel_field not in record or record[excel_field] is None or pd.isna(record[excel_field]):
-                formatted_record[zoho_field] = ""
-                continue
-            value = record[excel_field]
-            if excel_field in ["Creation_Time", "Date_of_Permit"]:
-                if isinstance(value, str):
-                    try:
-                        dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-                        formatted_record[zoho_field] = dt.strftime("%Y-%m-%dT%H:%M:%S+05:30")
-                    except ValueError:
-                        try:
-                            dt = datetime.strptime(value, "%Y-%m-%d")
-                            formatted_record[zoho_field] = dt.strftime("%Y-%m-%d")
-                        except ValueError:
-                            formatted_record[zoho_field] = str(value)
-                elif hasattr(value, "strftime"):
-                    formatted_record[zoho_field] = value.strftime("%Y-%m-%dT%H:%M:%S+05:30")
-                else:
-                    formatted_record[zoho_field] = str(value)            
-            elif excel_field in ["Dwelling Unit Info", "How_Much_Square_Feet"]:
-                try:
-                    numbers = re.findall(r'\d+', str(value))
-                    if numbers:
-                        formatted_record[zoho_field] = numbers[0]
-                    else:
-                        formatted_record[zoho_field] = "0"
-                except (ValueError, TypeError):
-                    formatted_record[zoho_field] = "0"            
-            elif excel_field == "Email ID":
-                email_str = str(value).strip()
-                if "@" in email_str and "." in email_str:
-                    formatted_record[zoho_field] = email_str
+            print(f"❌ Bulk write of {module} records failed: {e}")
+            for result in results:
+                if result["status"] != "success":
+                    result["message"] = str(e)
+        created = sum(1 for result in results if result["status"] == "success")
+        print(f"✅ Bulk write completed: {created} successful, {len(results) - created} failed out of {len(results)} {module} records")
+        return results
+
+    def write_record_batch(self, module, records, upsert_field=None):
+        """POST one batch to the record API and return one result per record, in input order."""
+        url = self.record_write_url(module, upsert_field)
+        headers = {'Content-Type': 'application/json'}
+        trigger = ['workflow'] if module == "Leads" else ['approval', 'workflow', 'blueprint']
+        payload = self.record_write_payload(records, upsert_field, trigger)
+        try:
+            response = self.scheduler.send(module, lambda: self.authorized_request("POST", url, json=payload, headers=headers), len(records))
+            if response.status_code not in (200, 201, 202, 207):
+                print(f"❌ HTTP Error {response.status_code}: {response.text}")
+                return [{"status": "error", "id": None, "message": f"HTTP {response.status_code}: {response.text[:500]}"} for _ in records]
+            results = [{"status": "error", "id": None, "message": "No result returned"} for _ in records]
+            # Zoho returns one entry per submitted record, in submission order.
+            for result, item in zip(results, response.json().get('data', [])):
+                if item.get('status') == 'success':
+                    result.update({
+                        "status": "success",
+                        "id": item.get('details', {}).get('id'),
+                        "message": item.get('message', 'Success'),
+                        "action": item.get('action', 'insert')
+                    })
                 else:
-                    formatted_record[zoho_field] = "" 
-            elif excel_field == "Mobile No.":
-                try:
-                    mobile_str = str(value).strip()
-                    mobile_clean = re.sub(r'[^\d+]', '', mobile_str)
-                    formatted_record[zoho_field] = mobile_clean
-                except:
-                    formatted_record[zoho_field] = str(value).strip()
-            else:
-                formatted_record[zoho_field] = str(value).strip()
-        
-        name_value = ""
-        if record.get("Applicant Name") and not pd.isna(record.get("Applicant Name")):
-            name_value = str(record["Applicant Name"]).strip()
-        elif record.get("Company_Name") and not pd.isna(record.get("Company_Name")):
-            name_value = str(record["Company_Name"]).strip()         
-        if name_value:
-            formatted_record["Name"] = self.truncate_field(name_value, 120)
-        else:
-            formatted_record["Name"] = f"Record_{datetime.now().strftime('%Y%m%d%H%M%S')}"        
-        long_fields = ["Applicant_Address", "Site_Address", "Nature_of_Developments", "Architect"]
-        for field in long_fields:
-            if field in formatted_record and formatted_record[field]:
-                formatted_record[field] = self.truncate_field(formatted_record[field], 255)  # Assuming 255 char limit
-        
-        if "Sales Person" in record and record["Sales Person"] and not pd.isna(record["Sales Person"]):
-            sales_person = str(record["Sales Person"]).strip()
-            user_id = self.get_user_id_by_name(sales_person)
-            if user_id:
-                formatted_record["Lead_Owner"] = sales_person
+                    result.update({"message": item.get('message', 'Unknown error'), "details": item.get('details', 'No details')})
+            return results
+        except Exception as e:
+            print(f"Error pushing batch to Zoho CRM: {str(e)}")
+            return [{"status": "error", "id": None, "message": str(e)} for _ in records]
+
+    def store_failed_records(self, module, records, results, upsert_field=None):
+        outbox = get_outbox()
+        failed = [(record, result) for record, result in zip(records, results) if result["status"] != "success"]
+        if outbox is None or not failed:
+            return
+        try:
+            outbox.add(
+                module,
+                [record for record, _ in failed],
+                [f"{result['message']}: {result['details']}" if result.get('details') else result['message'] for _, result in failed],
+                upsert_field
+            )
+        except Exception as e:
+            print(f"⚠️ Could not store failed {module} records in the outbox: {e}")
+
+    def _push_cmda_batch(self, batch):
+        _, formatted_batch, upsert_field = batch
+        results = self.write_record_batch(self.zoho_model_name, formatted_batch, upsert_field)
+        batch_success = 0
+        for result in results:
+            if result["status"] == "success":
+                batch_success += 1
+                action = "updated" if result.get('action') == 'update' else "created"
+                print(f"✅ Record {action} successfully: {result['message']}")
             else:
-                pass
-        if "No_of_bathrooms" in formatted_record:
-            pass
-        else:
-            pass        
-        formatted_record['Lead_Source'] = "Digital Leads"
-        return formatted_record
+                error_details = result.get('details', 'No details')
+                print(f"❌ Record failed: {result['message']}")
+                if isinstance(error_details, dict) and 'api_name' in error_details:
+                    print(f"   Field: {error_details.get('api_name')}")
+                    if 'maximum_length' in error_details:
+                        print(f"   Max length: {error_details.get('maximum_length')}")
+        self.store_failed_records(self.zoho_model_name, formatted_batch, results, upsert_field)
+        return batch_success, len(results) - batch_success
 
     def push_records_to_zoho(self, records, batch_size=100):
         try : 
             if not self.ensure_valid_token():
                 print("Error: Unable to ensure valid access token.")
                 return False
-            if not records:
+            if records is None or len(records) == 0:
                 return True 
             total_records = len(records)
             successful_records = 0
-            failed_records = 0        
-            for i in range(0, total_records, batch_size):
-                batch = records[i:i + batch_size]
-                formatted_batch = []
-                for record in batch:
-                    formatted_record = self.format_record_for_zoho(record)
-                    if formatted_record:
-                        # Validate the record before adding to batch
-                        validation_errors = self.validate_record_for_zoho(formatted_record)
-                        if validation_errors:
-                            print(f"❌ Record validation failed: {validation_errors}")
-                            failed_records += 1
-                            continue
-                        
-                        formatted_batch.append(formatted_record)
-                if not formatted_batch:
-                    continue            
-                url = f"{self.api_base_url}/{self.zoho_model_name}"
-                headers = {'Authorization': f'Zoho-oauthtoken {self.access_token}','Content-Type': 'application/json'}
-                payload = {'data': formatted_batch,'trigger': ['approval', 'workflow', 'blueprint']}
-                try:
-                    response = requests.post(url, json=payload, headers=headers)
-                    if response.status_code == 201:
-                        response_data = response.json()
-                        batch_success = 0
-                        batch_failed = 0
-                        if 'data' in response_data:
-                            for result in response_data['data']:
-                                if result.get('status') == 'success':
-                                    batch_success += 1
-                                    print(f"✅ Record created successfully: {result.get('message', 'Success')}")
-                                else:
-                                    batch_failed += 1
-                                    error_msg = result.get('message', 'Unknown error')
-                                    error_details = result.get('details', 'No details')
-                                    print(f"❌ Record failed: {error_msg}")
-                                    if isinstance(error_details, dict) and 'api_name' in error_details:
-                                        print(f"   Field: {error_details.get('api_name')}")
-                                        if 'maximum_length' in error_details:
-                                            print(f"   Max length: {error_details.get('maximum_length')}")
-                        successful_records += batch_success
-                        failed_records += batch_failed
-                    else:
-                        print(f"❌ HTTP Error {response.status_code}: {response.text}")
-                        failed_records += len(formatted_batch)
-                    if i + batch_size < total_records:
-                        time.sleep(1)  
-                except Exception as e:
-                    print(f"Error pushing batch to Zoho CRM: {str(e)}")
-                    failed_records += len(formatted_batch)        
+            failed_records = 0
+            formatted_records = []
+            frame = records if isinstance(records, pd.DataFrame) else records_to_frame(records)
+            for formatted_record in format_cmda_records(frame):
+                if formatted_record:
+                    # Validate the record before adding to batch
+                    validation_errors = self.validate_record_for_zoho(formatted_record)
+                    if validation_errors:
+                        print(f"❌ Record validation failed: {validation_errors}")
+                        failed_records += 1
+                        continue
+                    formatted_records.append(formatted_record)
+            if len(formatted_records) >= ZOHO_BULK_WRITE_THRESHOLD:
+                batches = self.group_into_batches(enumerate(formatted_records), CMDA_UPSERT_FIELD, len(formatted_records))
+                for _, bulk_batch, upsert_field in batches:
+                    bulk_results = self.bulk_write_records(self.zoho_model_name, bulk_batch, upsert_field)
+                    self.store_failed_records(self.zoho_model_name, bulk_batch, bulk_results, upsert_field)
+                    batch_success = sum(1 for result in bulk_results if result["status"] == "success")
+                    successful_records += batch_success
+                    failed_records += len(bulk_results) - batch_success
+            else:
+                batches = self.group_into_batches(enumerate(formatted_records), CMDA_UPSERT_FIELD, batch_size)
+                for batch_success, batch_failed in self.scheduler.map(self._push_cmda_batch, batches):
+                    successful_records += batch_success
+                    failed_records += batch_failed
             print(f"\n✅ Push completed: {successful_records} successful, {failed_records} failed out of {total_records} total")
             return successful_records > 0
         except Exception as e:
@@ -872,9 +948,9 @@ class ZohoCRMAutomatedAuth:
         if not self.ensure_valid_token():
             return False
         url = f"{self.api_base_url}/settings/modules"
-        headers = {'Authorization': f'Zoho-oauthtoken {self.access_token}','Content-Type': 'application/json'}
+        headers = {'Content-Type': 'application/json'}
         try:
-            response = requests.get(url, headers=headers)
+            response = self.authorized_request("GET", url, headers=headers)
             if response.status_code == 200:
                 modules = response.json()
                 module_names = [module['api_name'] for module in modules.get('modules', [])]
@@ -894,7 +970,10 @@ class ZohoCRMAutomatedAuth:
     def get_user_id_by_name(self, sales_person_name):
         if not self.ensure_valid_token():
             return None        
-        user_id_mapping = {
+        return self.sales_person_user_ids().get(sales_person_name)
+
+    def sales_person_user_ids(self):
+        return {
             "Abhishek R G": os.getenv("ZOHO_USER_ID_ABHISHEK"), 
             "Karthik": os.getenv("ZOHO_USER_ID_KARTHIK"),  
             "Jagan": os.getenv("ZOHO_USER_ID_JAGAN"),    
@@ -903,8 +982,7 @@ class ZohoCRMAutomatedAuth:
             "Ameen Syed": os.getenv("ZOHO_USER_ID_AMEEN"),
             "Balachander": os.getenv("ZOHO_USER_ID_BALACHANDER"),
             "Vijaya Kumar": os.getenv("ZOHO_USER_ID_VIJAYA_KUMAR"),
-        }        
-        return user_id_mapping.get(sales_person_name)
+        }
 
     def split_applicant_name(self, applicant_name):
         if not applicant_name or pd.isna(applicant_name):
@@ -971,125 +1049,107 @@ class ZohoCRMAutomatedAuth:
         else:
             return "Digital", "Lead"
 
-    def create_lead_from_cmda_record(self, cmda_record):
+    def create_leads_from_cmda_records(self, cmda_records, batch_size=100, verify=None):
+        """Create Leads in batches of up to 100 and return one result per input record (list or DataFrame row), in input order."""
+        verify = ZOHO_VERIFY_LEADS if verify is None else verify
+        results = [{"status": "error", "id": None, "message": "Not sent"} for _ in range(len(cmda_records))]
+        if not results:
+            return results
         if not self.ensure_valid_token():
-            return False        
-        Architect_Name = f"{cmda_record.get('Architect Name', '')} {cmda_record.get('Architect Address', '')} {cmda_record.get('Architect Email', '')}"
-        Architect_Name = Architect_Name.replace("nan", "").strip()
-        Architect_Name = self.truncate_field(Architect_Name, 255)
-        
-        How_Much_Square_Feet = cmda_record.get("Dwelling Unit Info", "")
-        numbers = re.findall(r'\d+', str(How_Much_Square_Feet))
-        if numbers:
-            How_Much_Square_Feet = numbers[0]
+            for result in results:
+                result["message"] = "Unable to ensure valid access token"
+            return results
+        errors = {}
+        if isinstance(cmda_records, pd.DataFrame):
+            frame = cmda_records
         else:
-            How_Much_Square_Feet = "0"
-        How_Much_Square_Feet = int(How_Much_Square_Feet) * 1000        
-        sales_person = cmda_record.get("Sales Person", "")
-        sales_person_clean = self.clean_value(sales_person)
-        owner_id = None         
-        if sales_person and self.clean_value(sales_person):
-            sales_person_clean = sales_person.strip()
-            owner_id = self.get_user_id_by_name(sales_person_clean)
-            if owner_id:
-                print(f"✅ Found user ID for {sales_person_clean}: {owner_id}")
-            else:
-                print(f"⚠️ No user ID mapping found for: {sales_person_clean}")        
-        applicant_name = cmda_record.get("Applicant Name", "")
-        first_name, last_name = self.split_applicant_name(applicant_name)
-        
-        # Truncate first and last names if needed
-        first_name = self.truncate_field(first_name, 40)
-        last_name = self.truncate_field(last_name, 80)
-        
-        lead_data = {
-            "Planning_Permission_No": self.truncate_field(self.clean_value(cmda_record.get("Planning Permission No.", "")), 120),
-            "Email": self.clean_value(cmda_record.get("Email ID", "")),
-            "Phone": self.clean_value(cmda_record.get("Mobile No.", "")),
-            "Company": self.truncate_field(cmda_record.get("Applicant Name", ""), 120),
-            "First_Name": first_name,
-            "Last_Name": last_name,
-            "Nature_of_Development": self.truncate_field(self.clean_value(cmda_record.get("Nature of Development", "")), 255),
-            "Area_Name": self.truncate_field(self.clean_value(cmda_record.get("Area Name", "")), 120),
-            "Site_Address": self.truncate_field(self.clean_value(cmda_record.get("Site Address", "")), 255),
-            "Reference": "Digital Lead Abhishek",
-            "Architect_Name": Architect_Name,
-            "Architect_Phone": self.truncate_field(cmda_record.get("Architect Mobile", "Not Provided"), 30),
-            "Lead_Source": "Digital Leads",
-            "How_Much_Square_Feet": str(How_Much_Square_Feet),
-            "Billing_Area": self.truncate_field(self.clean_value(cmda_record.get("Applicant Address", "")), 255),
-        }
-        if owner_id:
-            lead_data["Owner"] = owner_id
-            print(f"🎯 Setting Owner field to: {owner_id}")        
-        self.handle_numeric_fields(lead_data, cmda_record)
-        self.handle_picklist_fields(lead_data, cmda_record)
-        self.handle_date_fields(lead_data, cmda_record)
-        lead_data = self.final_data_cleaning(lead_data)        
-        print(f"📤 Sending Lead data to Zoho CRM:")
-        print(f"   👤 First Name: {first_name}")
-        print(f"   👤 Last Name: {last_name}")
-        print(f"   🏢 Company: {lead_data.get('Company', 'Not set')}")
-        print(f"   🎯 Owner ID: {lead_data.get('Owner', 'Not set')}")
-        print(f"   👥 Sales Person: {sales_person_clean}")       
-        url = f"{self.api_base_url}/Leads"
-        headers = {
-            'Authorization': f'Zoho-oauthtoken {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-        payload = {
-            'data': [lead_data],
-            'trigger': ['workflow']
-        }
-        try:
-            response = requests.post(url, json=payload, headers=headers)            
-            print(f"📊 Response Status: {response.status_code}")            
-            if response.status_code == 201:
-                result = response.json()
-                print("✅ Lead created successfully in Zoho CRM!")                
-                if 'data' in result:
-                    for item in result['data']:
-                        if item.get('status') == 'success':
-                            lead_id = item.get('details', {}).get('id', 'Unknown')
-                            created_by = item.get('details', {}).get('Created_By', {}).get('name', 'Unknown')                            
-                            lead_details = self.get_lead_details(lead_id)
-                            if lead_details:  
-                                owner_name = lead_details.get('Owner', {}).get('name', 'Unknown')
-                                print(f"🎉 Lead Created Successfully!")
-                                print(f"   📝 Lead ID: {lead_id}")
-                                print(f"   👤 Created By: {created_by}")
-                                print(f"   🎯 Assigned To (Owner): {owner_name}")
-                                print(f"   👤 First Name: {lead_details.get('First_Name', 'Not set')}")
-                                print(f"   👤 Last Name: {lead_details.get('Last_Name', 'Not set')}")
-                            else:
-                                print(f"🎉 Lead Created Successfully! ID: {lead_id}")
-                                print(f"👤 Created By: {created_by}")
-                        else:
-                            error_msg = item.get('message', 'Unknown error')
-                            error_details = item.get('details', 'No details')
-                            print(f"❌ Lead creation failed: {error_msg}")
-                            print(f"🔍 Error Details: {error_details}")
-                return True
-            else:
-                print(f"❌ Failed to create Lead. Status: {response.status_code}")
-                print(f"🔍 Response: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error creating Lead in Zoho CRM: {e}")
-            traceback.print_exc()
-            return False
+            frame = records_to_frame(cmda_records, LEAD_FIELD_DEFAULTS)
+        lead_records = build_lead_records(frame, self, errors)
+        leads = [(index, lead_data) for index, lead_data in enumerate(lead_records) if index not in errors]
+        for index, e in errors.items():
+            results[index]["message"] = f"Could not build lead: {e}"
+
+        if len(leads) >= ZOHO_BULK_WRITE_THRESHOLD:
+            for indexes, batch, upsert_field in self.group_into_batches(leads, LEADS_UPSERT_FIELD, len(leads)):
+                bulk_results = self.bulk_write_records("Leads", batch, upsert_field)
+                self.store_failed_records("Leads", batch, bulk_results, upsert_field)
+                for index, result in zip(indexes, bulk_results):
+                    results[index] = result
+            batches = []
+        else:
+            batches = self.group_into_batches(leads, LEADS_UPSERT_FIELD, batch_size)
+
+        def send_batch(indexed_batch):
+            indexes, batch, upsert_field = indexed_batch
+            batch_results = self.write_record_batch("Leads", batch, upsert_field)
+            self.store_failed_records("Leads", batch, batch_results, upsert_field)
+            for index, result in zip(indexes, batch_results):
+                if result["status"] != "success" and result.get("details"):
+                    result["message"] = f"{result['message']}: {result.pop('details')}"
+                results[index] = result
+
+        self.scheduler.map(send_batch, batches)
+        if verify:
+            for result in results:
+                if result["status"] == "success":
+                    lead_details = self.get_lead_details(result["id"])
+                    if lead_details:
+                        result["owner"] = lead_details.get('Owner', {}).get('name', 'Unknown')
+        created = sum(1 for result in results if result["status"] == "success")
+        print(f"✅ Leads created: {created} successful, {len(results) - created} failed out of {len(results)} total")
+        file_numbers = frame["File No."].tolist() if "File No." in frame.columns else ["Unknown"] * len(results)
+        for file_no, result in zip(file_numbers, results):
+            if result["status"] != "success":
+                print(f"❌ Lead failed for {file_no}: {result['message']}")
+        return results
+
+    def replay_outbox(self, module=None, batch_size=100, ignore_backoff=False):
+        """Retry records stored in the outbox; each batch reuses the stored payloads verbatim."""
+        outbox = get_outbox()
+        summary = {'replayed': 0, 'sent': 0, 'failed': 0, 'dead': 0}
+        if outbox is None:
+            return summary
+        entries = outbox.due(module, include_waiting=ignore_backoff)
+        if not entries:
+            print("✅ Outbox has nothing due for replay")
+            return summary
+        if not self.ensure_valid_token():
+            print("Error: Unable to ensure valid access token.")
+            summary['error'] = "Unable to ensure valid access token"
+            return summary
+        groups = {}
+        for entry in entries:
+            groups.setdefault((entry["module"], entry["upsert_field"]), []).append(entry)
+        batches = []
+        for (entry_module, upsert_field), group in groups.items():
+            for start in range(0, len(group), batch_size):
+                batches.append((entry_module, upsert_field, group[start:start + batch_size]))
+
+        def replay_batch(batch):
+            entry_module, upsert_field, batch_entries = batch
+            return batch_entries, self.write_record_batch(entry_module, [entry["payload"] for entry in batch_entries], upsert_field)
+
+        for batch_entries, batch_results in self.scheduler.map(replay_batch, batches):
+            sent_ids = []
+            for entry, result in zip(batch_entries, batch_results):
+                summary['replayed'] += 1
+                if result["status"] == "success":
+                    sent_ids.append(entry["id"])
+                    summary['sent'] += 1
+                else:
+                    error = f"{result['message']}: {result['details']}" if result.get('details') else result['message']
+                    summary['dead' if outbox.mark_failed(entry, error) == "dead" else 'failed'] += 1
+            outbox.mark_sent(sent_ids)
+        print(f"🔁 Outbox replay: {summary['sent']} sent, {summary['failed']} still failing, {summary['dead']} given up")
+        return summary
 
     def get_lead_details(self, lead_id):
         if not self.ensure_valid_token():
             return None
         url = f"{self.api_base_url}/Leads/{lead_id}"
-        headers = {
-            'Authorization': f'Zoho-oauthtoken {self.access_token}',
-            'Content-Type': 'application/json'
-        }        
+        headers = {'Content-Type': 'application/json'}
         try:
-            response = requests.get(url, headers=headers)
+            response = self.authorized_request("GET", url, headers=headers)
             if response.status_code == 200:
                 return response.json().get('data', [{}])[0]
             else:
@@ -1113,75 +1173,4 @@ class ZohoCRMAutomatedAuth:
         value_str = str(value).strip()
         if value_str.lower() in ['', 'nan', 'none', 'null']:
             return ""        
-        return value_str
-
-    def handle_numeric_fields(self, lead_data, cmda_record):
-        try:
-            dwelling_units = cmda_record.get("Dwelling Unit Info", "0")
-            if dwelling_units and self.clean_value(dwelling_units):
-                numbers = re.findall(r'\d+', str(dwelling_units))
-                if numbers:
-                    dwelling_value = int(numbers[0])
-                    lead_data["No_of_Bathrooms"] = dwelling_value * 2 
-                else:
-                    lead_data["No_of_Bathrooms"] = 0
-            else:
-                lead_data["No_of_Bathrooms"] = 0
-        except (ValueError, TypeError) as e:
-            lead_data["No_of_Bathrooms"] = 0
-        
-        try:
-            dwelling_units = cmda_record.get("Dwelling Unit Info", "0")
-            if dwelling_units and self.clean_value(dwelling_units):
-                numbers = re.findall(r'\d+', str(dwelling_units))
-                if numbers:
-                    lead_data["No_of_Units"] = int(numbers[0])
-                else:
-                    lead_data["No_of_Units"] = 0
-            else:
-                lead_data["No_of_Units"] = 0
-        except (ValueError, TypeError) as e:
-            lead_data["No_of_Units"] = 0
-
-    def handle_picklist_fields(self, lead_data, cmda_record):
-        which_brand = cmda_record.get("Which_Brand_Looking_for", "")
-        if which_brand and self.clean_value(which_brand):
-            lead_data["Which_Brand_Looking_for"] = self.truncate_field(self.clean_value(which_brand), 120)        
-        if not lead_data.get("Future_Projects"):
-            lead_data["Future_Projects"] = "-None-"
-        if not lead_data.get("Lead_Source"):
-            lead_data["Lead_Source"] = "Digital Leads"
-
-    def handle_date_fields(self, lead_data, cmda_record):
-        date_of_permit = cmda_record.get("Date of permit", "")
-        if date_of_permit and self.clean_value(date_of_permit):
-            try:
-                if isinstance(date_of_permit, str) and len(date_of_permit) == 10 and '-' in date_of_permit:
-                    dt = datetime.strptime(date_of_permit, "%d-%m-%Y")
-                    lead_data["Date_of_Permit"] = dt.strftime("%Y-%m-%d")
-                else:
-                    lead_data["Date_of_Permit"] = self.clean_value(date_of_permit)
-            except ValueError:
-                lead_data["Date_of_Permit"] = self.clean_value(date_of_permit)
-        date_of_application = cmda_record.get("Date of Application", "")
-        if date_of_application and self.clean_value(date_of_application):
-            try:
-                if isinstance(date_of_application, str) and '/' in date_of_application:
-                    dt = datetime.strptime(date_of_application, "%d/%m/%Y")
-                    lead_data["Date_of_Application"] = dt.strftime("%Y-%m-%d")
-                else:
-                    lead_data["Date_of_Application"] = self.clean_value(date_of_application)
-            except ValueError:
-                lead_data["Date_of_Application"] = self.clean_value(date_of_application)
-
-    def final_data_cleaning(self, lead_data):
-        cleaned_data = {}        
-        for key, value in lead_data.items():
-            if value is None:
-                continue
-            if isinstance(value, str) and value.strip() == "":
-                continue
-            if pd.isna(value):
-                continue            
-            cleaned_data[key] = value        
-        return cleaned_data
\ No newline at end of file
+        return value_str
\ No newline at end of file
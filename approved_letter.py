@@ -1,7 +1,10 @@
+import os
 import re
-import PyPDF2
+from extractor import extract_pages_text
 
-def extract_registered_architect_from_bytes(pdf_bytesio):
+LETTER_TEXT_ENGINE = os.getenv("LETTER_TEXT_ENGINE", "pypdfium2")
+
+def extract_registered_architect_from_bytes(pdf_bytesio, engine=None):
     try:
         data = {
             "status": "success",
@@ -10,9 +13,7 @@ def extract_registered_architect_from_bytes(pdf_bytesio):
             "email": None,
             "mobile": None
         }
-        reader = PyPDF2.PdfReader(pdf_bytesio)
-        for page in reader.pages:
-            text = page.extract_text()
+        for text in extract_pages_text(pdf_bytesio, engine or LETTER_TEXT_ENGINE):
             if not text:
                 continue
             lines = text.split("\n")
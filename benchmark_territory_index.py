@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+import territory_index
+from territory_index import AREA_FUZZY_MATCH_THRESHOLD, TerritoryIndex, normalize_area_text, territory_file, get_territory_index
+
+UNKNOWN_AREAS = ["Chennai", "Thalakkanancheri Village", "Madhandhapuram Extn", "", "nan", "  ", "Purusawalkam-II"]
+
+def legacy_find_sales_person(area_name, territories):
+    # The per-row scan assign_sales_person_frame used before the index.
+    if pd.isna(area_name) or area_name.strip() == "":
+        return None
+    normalized_area = normalize_area_text(area_name)
+    for sales_person, areas in territories.items():
+        for mapped_area in areas:
+            if normalized_area == normalize_area_text(mapped_area):
+                return sales_person
+    return None
+
+def synthetic_areas(territories, rows, seed=7):
+    rng = random.Random(seed)
+    known = [area for areas in territories.values() for area in areas]
+    def variant(area):
+        return rng.choice([area, area.upper(), f" {area.lower()} ", area.replace(" ", "  "), f"{area}."])
+    return pd.Series([
+        None if rng.random() < 0.03 else variant(rng.choice(known)) if rng.random() < 0.85 else rng.choice(UNKNOWN_AREAS)
+        for _ in range(rows)
+    ], dtype=object)
+
+def misspelled_areas(index, count, seed=7):
+    """count misspellings of known areas, with the salesperson each one should resolve to."""
+    rng = random.Random(seed)
+    known = list(index.area_names.items())
+    areas, expected = [], []
+    for _ in range(count):
+        key, area = rng.choice(known)
+        area = list(area)
+        area[rng.randrange(len(area))] = rng.choice("aeiouklmnrst")
+        areas.append("".join(area) + rng.choice(["", "", " Village", "m"]))
+        expected.append(index.by_area[key])
+    return pd.Series(areas, dtype=object), pd.Series(expected, dtype=object)
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def check_hot_reload(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    with tempfile.TemporaryDirectory() as directory:
+        copy = os.path.join(directory, "territories.json")
+        with open(copy, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        territory_index.TERRITORY_FILE = copy
+        territory_index.TERRITORY_RELOAD_INTERVAL_SECONDS = 0
+        before = get_territory_index().lookup("Benchmark Nagar")
+        data["version"] = (data.get("version") or 0) + 1
+        data["territories"]["Benchmark"] = ["Benchmark Nagar"]
+        with open(copy, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.utime(copy, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        after = get_territory_index().lookup("Benchmark Nagar")
+    return before is None and after == "Benchmark"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the linear territory scan with the prebuilt territory index.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--legacy-rows", type=int, default=20000, help="Rows timed with the linear scan; its cost is extrapolated beyond this.")
+    parser.add_argument("--fuzzy-threshold", type=int, nargs="+", default=[80, 85, 88, 90, 95])
+    parser.add_argument("--fuzzy-areas", type=int, default=5000, help="Distinct misspelled areas to resolve fuzzily.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    path = territory_file()
+    index, load_seconds = timed(lambda: TerritoryIndex.from_file(path))
+    print(f"Territory map v{index.version}: {len(index.by_area)} areas, built in {load_seconds * 1000:.1f} ms")
+    mismatches = 0
+    print(f"{'Rows':>8}{'scan s':>10}{'index s':>10}{'speedup':>10}{'identical':>11}")
+    for rows in args.rows:
+        areas = synthetic_areas(index.territories, rows, args.seed)
+        sample = areas.iloc[:min(rows, args.legacy_rows)]
+        expected, scan_seconds = timed(lambda: sample.apply(lambda area: legacy_find_sales_person(area, index.territories)))
+        scan_seconds *= rows / len(sample)
+        actual, index_seconds = timed(lambda: index.assign(areas, 100))
+        # apply() turns the scan's None into NaN; both mean unmatched downstream.
+        identical = [None if pd.isna(person) else person for person in expected] == actual.iloc[:len(sample)].tolist()
+        mismatches += not identical
+        print(f"{rows:>8}{scan_seconds:>10.2f}{index_seconds:>10.3f}{scan_seconds / index_seconds:>9.0f}x{str(identical):>11}")
+    misspelled, expected = misspelled_areas(index, args.fuzzy_areas, args.seed)
+    distinct = misspelled.nunique()
+    print(f"Fuzzy over {distinct} distinct misspelled areas (default threshold {AREA_FUZZY_MATCH_THRESHOLD}):")
+    print(f"{'Threshold':>10}{'matched':>9}{'precision':>11}{'recall':>8}{'ms/area':>9}")
+    for threshold in args.fuzzy_threshold:
+        assigned, fuzzy_seconds = timed(lambda: index.assign(misspelled, threshold))
+        matched = assigned.notna()
+        correct = (assigned[matched] == expected[matched]).sum()
+        precision = correct / matched.sum() if matched.any() else 1.0
+        print(f"{threshold:>10}{int(matched.sum()):>9}{precision:>11.3f}{correct / len(misspelled):>8.3f}{fuzzy_seconds / distinct * 1000:>9.3f}")
+    _, cached_seconds = timed(lambda: index.assign(misspelled, args.fuzzy_threshold[-1]))
+    print(f"Fuzzy again from the per-string cache: {cached_seconds / len(misspelled) * 1000:.4f} ms per row")
+    reloaded = check_hot_reload(path)
+    print(f"Hot reload picked up an edited territory file: {reloaded}")
+    if mismatches or not reloaded:
+        print("❌ Territory index disagrees with the linear scan")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import sys
+import time
+import argparse
+import statistics
+from io import BytesIO
+from pathlib import Path
+from pdf_cache import PDF_CACHE_DIR
+from pdf_extraction import missing_required_fields
+from extractor import TEXT_ENGINES, extract_pages_text, extract_fields
+
+def load_corpus(corpus_dir, limit):
+    paths = sorted(Path(corpus_dir).rglob("*.pdf"))[:limit]
+    return [(path.name, path.read_bytes()) for path in paths]
+
+def benchmark_engine(engine, corpus, repeat):
+    latencies = []
+    incomplete = 0
+    errors = 0
+    for _, pdf_bytes in corpus:
+        fields = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                pages = extract_pages_text(BytesIO(pdf_bytes), engine, max_pages=1)
+                fields = extract_fields(pages[0] if pages else "")
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+        if fields is not None and missing_required_fields(fields):
+            incomplete += 1
+    return latencies, incomplete, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-PDF latency of the PDF text engines on the same corpus.")
+    parser.add_argument("corpus_dir", nargs="?", default=str(Path(PDF_CACHE_DIR) / "blobs"),
+                        help="Directory searched recursively for *.pdf files (defaults to the PDF cache).")
+    parser.add_argument("--engines", nargs="+", default=list(TEXT_ENGINES), choices=list(TEXT_ENGINES))
+    parser.add_argument("--limit", type=int, default=200, help="Maximum number of PDFs to load.")
+    parser.add_argument("--repeat", type=int, default=3, help="Extractions per PDF per engine.")
+    args = parser.parse_args()
+    corpus = load_corpus(args.corpus_dir, args.limit)
+    if not corpus:
+        print(f"❌ No PDFs found under {args.corpus_dir}")
+        return 1
+    print(f"Benchmarking {len(corpus)} PDFs x {args.repeat} runs (first page + extract_fields)\n")
+    print(f"{'Engine':<12}{'mean ms':>10}{'median ms':>11}{'p95 ms':>10}{'incomplete':>12}{'errors':>8}")
+    for engine in args.engines:
+        latencies, incomplete, errors = benchmark_engine(engine, corpus, args.repeat)
+        if not latencies:
+            print(f"{engine:<12}{'-':>10}{'-':>11}{'-':>10}{incomplete:>12}{errors:>8}")
+            continue
+        p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+        print(f"{engine:<12}{statistics.mean(latencies):>10.1f}{statistics.median(latencies):>11.1f}{p95:>10.1f}{incomplete:>12}{errors:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+import io
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import traceback
+from datetime import datetime
+from contextlib import redirect_stdout
+import pandas as pd
+from ZohoCRMAutomatedAuth import ZohoCRMAutomatedAuth
+from zoho_formatter import LEAD_FIELD_DEFAULTS, records_to_frame, format_cmda_records, build_lead_records
+
+SALES_PEOPLE = ["Abhishek R G", "Karthik", "Jagan", "Dinakaran", "Venkatesh", "Ameen Syed", "Balachander", "Vijaya Kumar", " Jagan ", ""]
+AREAS = ["Adyar", "Anna Nagar", "Velachery", "Tambaram", "Porur", "Sholinganallur", "nan", ""]
+APPLICANTS = ["R. Kumar", "Thiru S Ramesh", "MR K Senthil Kumar", "M/s. Sri Balaji Builders Pvt Ltd Rep by its Managing Partner",
+              "Lakshmi", "DR A P J Natarajan and Others", "", "   "]
+
+def synthetic_frame(rows, seed=7):
+    rng = random.Random(seed)
+    def maybe(value, missing=0.1):
+        return None if rng.random() < missing else value
+    data = []
+    for index in range(rows):
+        units = rng.randint(1, 400)
+        data.append({
+            "File No.": f"C/PP/MSB/{index:06d}/2024",
+            "Planning Permission No.": maybe(rng.choice([f"PP/{index:06d}/2024", "Failed", "Not found"]), 0.05),
+            "Date of permit": maybe(rng.choice([f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024", "2024-05-01", "31-02-2024"])),
+            "Date of Application": maybe(rng.choice([f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2023", "N/A"])),
+            "Applicant Name": maybe(rng.choice(APPLICANTS) + (f" {index}" if rng.random() < 0.5 else ""), 0.05),
+            "Applicant Address": maybe("No. %d, %s Street, Chennai - 600 0%02d " % (index, rng.choice(AREAS), rng.randint(10, 99)) * rng.choice([1, 1, 10])),
+            "Email ID": maybe(rng.choice([f"owner{index}@example.com", "not provided", f" user{index}@mail.in "])),
+            "Mobile No.": maybe(rng.choice([9000000000 + index, f"+91 98400 {index % 100000:05d}", "nan"])),
+            "Nature of Development": maybe(rng.choice(["Residential", "Commercial", "Residential Building with Stilt + 4 Floors " * rng.choice([1, 8])])),
+            "Dwelling Unit Info": maybe(rng.choice([f"{units} Dwelling Units", f"Stilt + 4 floors, {units} DU", units, "Nil", "007 units"])),
+            "Architect Name": maybe(rng.choice(["Ar. Meena", "Jnanam Associates", "nan"])),
+            "Architect Address": maybe("Nungambakkam, Chennai"),
+            "Architect Email": maybe(rng.choice(["arch@studio.in", ""])),
+            "Architect Mobile": maybe(rng.choice([9840012345, "044-2345 6789"])),
+            "Site Address": maybe(f"S.No. {index}, {rng.choice(AREAS)} Village " * rng.choice([1, 12])),
+            "Area Name": maybe(rng.choice(AREAS)),
+            "Sales Person": maybe(rng.choice(SALES_PEOPLE)),
+            "Company_Name": maybe(rng.choice(["Balaji Constructions", ""])),
+            "Creation_Time": maybe(rng.choice(["2024-06-01 10:15:00", "2024-06-02", pd.Timestamp("2024-06-03 09:00:00"), "yesterday"])),
+            "Which_Brand_Looking_for": maybe(rng.choice(["Jaquar", "Kohler", 0, "none"])),
+            "How_Much_Square_Feet": maybe(rng.choice([f"{units * 1000} sq.ft", 1200, "TBD"])),
+            "Reference": "Digital Lead",
+        })
+    return pd.DataFrame(data)
+
+# The row-wise formatters the CRM client used before zoho_formatter, kept as the reference its output must match.
+def legacy_format_record_for_zoho(crm, record):
+    formatted_record = {}
+    field_mapping = {
+        "Sales Person": "Lead_Owner", 
+        "Email ID": "Email",
+        "Mobile No.": "Mobile_Number",
+        "Date of permit": "Date_of_Permit",
+        "Applicant Name": "Lead_Name",
+        "Nature of Development": "Nature_of_Developments",
+        "Dwelling Unit Info": "Dwelling_Unit_Info",
+        "Reference": "Reference",
+        "Company_Name": "Company_Name",
+        "Architect Name": "Architect",
+        "Planning Permission No.": "Plan_Permission",
+        "Applicant Address": "Applicant_Address",
+        "Future_Projects": "Future_Project", 
+        "Creation_Time": "Creation_Time",
+        "Which_Brand_Looking_for": "Which_Brand_Looking_for",
+        "How_Much_Square_Feet": "How_Much_Square_Feet",
+        "Area Name": "Area_Name",  
+        "Site Address": "Site_Address"
+    }                
+    try:
+        dwelling_units = record.get("Dwelling Unit Info")
+        if dwelling_units is not None and not pd.isna(dwelling_units):
+            dwelling_str = str(dwelling_units).strip()
+            if dwelling_str and dwelling_str != '' and dwelling_str.lower() != 'nan':
+                try:
+                    numbers = re.findall(r'\d+', dwelling_str)
+                    if numbers:
+                        dwelling_value = int(numbers[0])
+                        bathrooms = dwelling_value * 2
+                        formatted_record["No_of_bathrooms"] = str(bathrooms)
+                    else:
+                        formatted_record["No_of_bathrooms"] = "0"
+                except (ValueError, TypeError) as e:
+                    formatted_record["No_of_bathrooms"] = "0"
+            else:
+                formatted_record["No_of_bathrooms"] = "0"
+        else:
+            formatted_record["No_of_bathrooms"] = "0"
+    except Exception as e:
+        traceback.print_exc()
+        formatted_record["No_of_bathrooms"] = "0"        
+    for excel_field, zoho_field in field_mapping.items():
+        if excel_field not in record or record[excel_field] is None or pd.isna(record[excel_field]):
+            formatted_record[zoho_field] = ""
+            continue
+        value = record[excel_field]
+        if excel_field in ["Creation_Time", "Date_of_Permit"]:
+            if isinstance(value, str):
+                try:
+                    dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+                    formatted_record[zoho_field] = dt.strftime("%Y-%m-%dT%H:%M:%S+05:30")
+                except ValueError:
+                    try:
+                        dt = datetime.strptime(value, "%Y-%m-%d")
+                        formatted_record[zoho_field] = dt.strftime("%Y-%m-%d")
+                    except ValueError:
+                        formatted_record[zoho_field] = str(value)
+            elif hasattr(value, "strftime"):
+                formatted_record[zoho_field] = value.strftime("%Y-%m-%dT%H:%M:%S+05:30")
+            else:
+                formatted_record[zoho_field] = str(value)            
+        elif excel_field in ["Dwelling Unit Info", "How_Much_Square_Feet"]:
+            try:
+                numbers = re.findall(r'\d+', str(value))
+                if numbers:
+                    formatted_record[zoho_field] = numbers[0]
+                else:
+                    formatted_record[zoho_field] = "0"
+            except (ValueError, TypeError):
+                formatted_record[zoho_field] = "0"            
+        elif excel_field == "Email ID":
+            email_str = str(value).strip()
+            if "@" in email_str and "." in email_str:
+                formatted_record[zoho_field] = email_str
+            else:
+                formatted_record[zoho_field] = "" 
+        elif excel_field == "Mobile No.":
+            try:
+                mobile_str = str(value).strip()
+                mobile_clean = re.sub(r'[^\d+]', '', mobile_str)
+                formatted_record[zoho_field] = mobile_clean
+            except:
+                formatted_record[zoho_field] = str(value).strip()
+        else:
+            formatted_record[zoho_field] = str(value).strip()
+    
+    name_value = ""
+    if record.get("Applicant Name") and not pd.isna(record.get("Applicant Name")):
+        name_value = str(record["Applicant Name"]).strip()
+    elif record.get("Company_Name") and not pd.isna(record.get("Company_Name")):
+        name_value = str(record["Company_Name"]).strip()         
+    if name_value:
+        formatted_record["Name"] = crm.truncate_field(name_value, 120)
+    else:
+        formatted_record["Name"] = f"Record_{datetime.now().strftime('%Y%m%d%H%M%S')}"        
+    long_fields = ["Applicant_Address", "Site_Address", "Nature_of_Developments", "Architect"]
+    for field in long_fields:
+        if field in formatted_record and formatted_record[field]:
+            formatted_record[field] = crm.truncate_field(formatted_record[field], 255)  # Assuming 255 char limit
+    
+    if "Sales Person" in record and record["Sales Person"] and not pd.isna(record["Sales Person"]):
+        sales_person = str(record["Sales Person"]).strip()
+        user_id = crm.get_user_id_by_name(sales_person)
+        if user_id:
+            formatted_record["Lead_Owner"] = sales_person
+        else:
+            pass
+    if "No_of_bathrooms" in formatted_record:
+        pass
+    else:
+        pass        
+    formatted_record['Lead_Source'] = "Digital Leads"
+    return formatted_record
+
+def legacy_build_lead_data(crm, cmda_record):
+    Architect_Name = f"{cmda_record.get('Architect Name', '')} {cmda_record.get('Architect Address', '')} {cmda_record.get('Architect Email', '')}"
+    Architect_Name = Architect_Name.replace("nan", "").strip()
+    Architect_Name = crm.truncate_field(Architect_Name, 255)
+    
+    How_Much_Square_Feet = cmda_record.get("Dwelling Unit Info", "")
+    numbers = re.findall(r'\d+', str(How_Much_Square_Feet))
+    if numbers:
+        How_Much_Square_Feet = numbers[0]
+    else:
+        How_Much_Square_Feet = "0"
+    How_Much_Square_Feet = int(How_Much_Square_Feet) * 1000        
+    sales_person = cmda_record.get("Sales Person", "")
+    sales_person_clean = crm.clean_value(sales_person)
+    owner_id = None         
+    if sales_person and crm.clean_value(sales_person):
+        sales_person_clean = sales_person.strip()
+        owner_id = crm.get_user_id_by_name(sales_person_clean)
+        if owner_id:
+            print(f"✅ Found user ID for {sales_person_clean}: {owner_id}")
+        else:
+            print(f"⚠️ No user ID mapping found for: {sales_person_clean}")        
+    applicant_name = cmda_record.get("Applicant Name", "")
+    first_name, last_name = crm.split_applicant_name(applicant_name)
+    
+    # Truncate first and last names if needed
+    first_name = crm.truncate_field(first_name, 40)
+    last_name = crm.truncate_field(last_name, 80)
+    
+    lead_data = {
+        "Planning_Permission_No": crm.truncate_field(crm.clean_value(cmda_record.get("Planning Permission No.", "")), 120),
+        "Email": crm.clean_value(cmda_record.get("Email ID", "")),
+        "Phone": crm.clean_value(cmda_record.get("Mobile No.", "")),
+        "Company": crm.truncate_field(cmda_record.get("Applicant Name", ""), 120),
+        "First_Name": first_name,
+        "Last_Name": last_name,
+        "Nature_of_Development": crm.truncate_field(crm.clean_value(cmda_record.get("Nature of Development", "")), 255),
+        "Area_Name": crm.truncate_field(crm.clean_value(cmda_record.get("Area Name", "")), 120),
+        "Site_Address": crm.truncate_field(crm.clean_value(cmda_record.get("Site Address", "")), 255),
+        "Reference": "Digital Lead Abhishek",
+        "Architect_Name": Architect_Name,
+        "Architect_Phone": crm.truncate_field(cmda_record.get("Architect Mobile", "Not Provided"), 30),
+        "Lead_Source": "Digital Leads",
+        "How_Much_Square_Feet": str(How_Much_Square_Feet),
+        "Billing_Area": crm.truncate_field(crm.clean_value(cmda_record.get("Applicant Address", "")), 255),
+    }
+    if owner_id:
+        lead_data["Owner"] = owner_id
+        print(f"🎯 Setting Owner field to: {owner_id}")        
+    handle_numeric_fields(crm, lead_data, cmda_record)
+    handle_picklist_fields(crm, lead_data, cmda_record)
+    handle_date_fields(crm, lead_data, cmda_record)
+    return final_data_cleaning(lead_data)
+
+def handle_numeric_fields(crm, lead_data, cmda_record):
+    try:
+        dwelling_units = cmda_record.get("Dwelling Unit Info", "0")
+        if dwelling_units and crm.clean_value(dwelling_units):
+            numbers = re.findall(r'\d+', str(dwelling_units))
+            if numbers:
+                dwelling_value = int(numbers[0])
+                lead_data["No_of_Bathrooms"] = dwelling_value * 2 
+            else:
+                lead_data["No_of_Bathrooms"] = 0
+        else:
+            lead_data["No_of_Bathrooms"] = 0
+    except (ValueError, TypeError) as e:
+        lead_data["No_of_Bathrooms"] = 0
+    
+    try:
+        dwelling_units = cmda_record.get("Dwelling Unit Info", "0")
+        if dwelling_units and crm.clean_value(dwelling_units):
+            numbers = re.findall(r'\d+', str(dwelling_units))
+            if numbers:
+                lead_data["No_of_Units"] = int(numbers[0])
+            else:
+                lead_data["No_of_Units"] = 0
+        else:
+            lead_data["No_of_Units"] = 0
+    except (ValueError, TypeError) as e:
+        lead_data["No_of_Units"] = 0
+
+def handle_picklist_fields(crm, lead_data, cmda_record):
+    which_brand = cmda_record.get("Which_Brand_Looking_for", "")
+    if which_brand and crm.clean_value(which_brand):
+        lead_data["Which_Brand_Looking_for"] = crm.truncate_field(crm.clean_value(which_brand), 120)        
+    if not lead_data.get("Future_Projects"):
+        lead_data["Future_Projects"] = "-None-"
+    if not lead_data.get("Lead_Source"):
+        lead_data["Lead_Source"] = "Digital Leads"
+
+def handle_date_fields(crm, lead_data, cmda_record):
+    date_of_permit = cmda_record.get("Date of permit", "")
+    if date_of_permit and crm.clean_value(date_of_permit):
+        try:
+            if isinstance(date_of_permit, str) and len(date_of_permit) == 10 and '-' in date_of_permit:
+                dt = datetime.strptime(date_of_permit, "%d-%m-%Y")
+                lead_data["Date_of_Permit"] = dt.strftime("%Y-%m-%d")
+            else:
+                lead_data["Date_of_Permit"] = crm.clean_value(date_of_permit)
+        except ValueError:
+            lead_data["Date_of_Permit"] = crm.clean_value(date_of_permit)
+    date_of_application = cmda_record.get("Date of Application", "")
+    if date_of_application and crm.clean_value(date_of_application):
+        try:
+            if isinstance(date_of_application, str) and '/' in date_of_application:
+                dt = datetime.strptime(date_of_application, "%d/%m/%Y")
+                lead_data["Date_of_Application"] = dt.strftime("%Y-%m-%d")
+            else:
+                lead_data["Date_of_Application"] = crm.clean_value(date_of_application)
+        except ValueError:
+            lead_data["Date_of_Application"] = crm.clean_value(date_of_application)
+
+def final_data_cleaning(lead_data):
+    cleaned_data = {}        
+    for key, value in lead_data.items():
+        if value is None:
+            continue
+        if isinstance(value, str) and value.strip() == "":
+            continue
+        if pd.isna(value):
+            continue            
+        cleaned_data[key] = value        
+    return cleaned_data
+
+def cmda_records(frame):
+    # The workbook-based import dropped NaN cells from every record.
+    return [{key: value for key, value in record.items() if pd.notna(value)} for record in frame.to_dict(orient="records")]
+
+def canonical(payloads, generated_name=False):
+    rows = []
+    for payload in payloads:
+        if generated_name and str(payload.get("Name", "")).startswith("Record_"):
+            # The fallback Name embeds the current second, so only its presence is comparable.
+            payload = dict(payload, Name="Record_")
+        rows.append(json.dumps(payload, ensure_ascii=False, default=str))
+    return rows
+
+def timed(function):
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = function()
+    return result, time.perf_counter() - start
+
+def build_leads_row_wise(crm, records):
+    leads = []
+    for record in records:
+        try:
+            leads.append(legacy_build_lead_data(crm, record))
+        except Exception:
+            leads.append(None)
+    return leads
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the row-wise and columnar Zoho payload formatters.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    crm = ZohoCRMAutomatedAuth()
+    # Formatting needs no network; skip the token check the row-wise helpers run per record.
+    crm.ensure_valid_token = lambda: True
+    mismatches = 0
+    print(f"{'Rows':>8}{'Payload':>10}{'row-wise s':>12}{'columnar s':>12}{'speedup':>9}{'identical':>11}")
+    for rows in args.rows:
+        frame = synthetic_frame(rows, args.seed)
+        records = cmda_records(frame)
+        expected, row_seconds = timed(lambda: [legacy_format_record_for_zoho(crm, record) for record in records])
+        actual, column_seconds = timed(lambda: format_cmda_records(records_to_frame(records)))
+        identical = canonical(expected, True) == canonical(actual, True)
+        mismatches += not identical
+        print(f"{rows:>8}{'CMDA':>10}{row_seconds:>12.2f}{column_seconds:>12.2f}{row_seconds / column_seconds:>8.1f}x{str(identical):>11}")
+
+        records = frame.to_dict(orient="records")
+        expected, row_seconds = timed(lambda: build_leads_row_wise(crm, records))
+        actual, column_seconds = timed(lambda: build_lead_records(records_to_frame(records, LEAD_FIELD_DEFAULTS), crm))
+        identical = canonical(expected) == canonical(actual)
+        mismatches += not identical
+        print(f"{rows:>8}{'Leads':>10}{row_seconds:>12.2f}{column_seconds:>12.2f}{row_seconds / column_seconds:>8.1f}x{str(identical):>11}")
+    if mismatches:
+        print("❌ Columnar payloads differ from the row-wise formatter")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
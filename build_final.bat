@@ -27,6 +27,7 @@ python -m PyInstaller --onefile ^
   --add-data ".env;." ^
   --add-data "zoho_tokens.json;." ^
   --add-data "ExistData.xlsx;." ^
+  --add-data "territories.json;." ^
   --add-data "loader.gif;." ^
   --add-data "client_logo.png;." ^
   --add-data "%USERPROFILE%\AppData\Local\ms-playwright;ms-playwright" ^
@@ -39,6 +40,19 @@ python -m PyInstaller --onefile ^
   --hidden-import="approved_letter" ^
   --hidden-import="Integration" ^
   --hidden-import="ZohoCRMAutomatedAuth" ^
+  --hidden-import="scraper" ^
+  --hidden-import="pdf_cache" ^
+  --hidden-import="pdf_extraction" ^
+  --hidden-import="pipeline" ^
+  --hidden-import="run_journal" ^
+  --hidden-import="http_client" ^
+  --hidden-import="zoho_scheduler" ^
+  --hidden-import="token_manager" ^
+  --hidden-import="token_broker" ^
+  --hidden-import="outbox" ^
+  --hidden-import="zoho_formatter" ^
+  --hidden-import="history_store" ^
+  --hidden-import="territory_index" ^
   --hidden-import="requests" ^
   --hidden-import="urllib3" ^
   --hidden-import="urllib.parse" ^
@@ -68,6 +82,7 @@ if exist "dist\CMDA_Scraper.exe" (
     
     echo Copying data files to dist folder...
     copy "ExistData.xlsx" "dist\" >nul
+    copy "territories.json" "dist\" >nul
     copy ".env" "dist\" >nul
     copy "zoho_tokens.json" "dist\" >nul
     copy "loader.gif" "dist\" >nul
@@ -0,0 +1,94 @@
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from Integration import lead_import
+from extractor import export_to_xlsx
+from helper import export_frame
+from pipeline import run_streaming_pipeline
+from http_client import connection_stats
+from scraper import PERMIT_PDF_WORKERS, APPROVAL_LETTER_WORKERS, PDF_EXTRACT_PROCESSES, ENTRY_VALUES, scrape_year
+
+def print_progress(current, total):
+    if current == total or current % 25 == 0:
+        print(f"  Progress: {current}/{total}")
+
+def run_year(year, args):
+    started_at = time.time()
+    summary = {'year': year, 'entries': args.entries, 'started_at': datetime.now().isoformat()}
+    try:
+        if args.stream:
+            result = run_streaming_pipeline(
+                year, args.entries,
+                permit_workers=args.permit_workers,
+                letter_workers=args.letter_workers,
+                extract_processes=args.extract_processes,
+                skip_known=not args.no_skip_known,
+                push_to_crm=not args.dry_run,
+                progress_callback=print_progress,
+                output_dir=args.output_dir
+            )
+            records_count = result['records_count']
+            temp_path, download_path = result['temp_path'], result['download_path']
+            scraping_stats, crm_result = result['scraping_stats'], result['crm_result']
+            if result.get('stage_errors'):
+                summary['stage_errors'] = result['stage_errors']
+        else:
+            pdf_streams, urls, approved_links, approved_letter, architect_details, scraping_stats = scrape_year(
+                year, args.entries, print_progress, args.permit_workers, args.letter_workers, args.extract_processes,
+                skip_known=not args.no_skip_known, resume=not args.no_resume
+            )
+            records_count = len(pdf_streams)
+            temp_path, download_path = export_to_xlsx(
+                pdf_streams, year, urls, approved_links, approved_letter, architect_details, output_dir=args.output_dir
+            )
+            if args.dry_run:
+                crm_result = {"message": "CRM push skipped.", "statusCode": 200, "status": True, "analysis_data": {}}
+            else:
+                crm_result = lead_import(file_path=temp_path, records=export_frame(pdf_streams, architect_details))
+        summary.update({
+            'status': "success" if crm_result.get("status") else "failed",
+            'records_count': records_count,
+            'temp_path': temp_path,
+            'download_path': download_path,
+            'scraping_stats': scraping_stats,
+            'crm_result': crm_result
+        })
+    except Exception as e:
+        print(f"❌ Run for {year} failed: {e}")
+        summary.update({'status': "error", 'error': str(e)})
+    summary['duration_seconds'] = round(time.time() - started_at, 1)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape CMDA approvals and import leads into Zoho CRM without the GUI.")
+    parser.add_argument("--year", nargs="+", required=True, help="One or more years to scrape, e.g. --year 2024 2025.")
+    parser.add_argument("--entries", default="All", choices=list(ENTRY_VALUES), help="Rows to scrape per year.")
+    parser.add_argument("--permit-workers", type=int, default=PERMIT_PDF_WORKERS)
+    parser.add_argument("--letter-workers", type=int, default=APPROVAL_LETTER_WORKERS)
+    parser.add_argument("--extract-processes", type=int, default=PDF_EXTRACT_PROCESSES,
+                        help="PDF extraction processes (0 extracts in threads).")
+    parser.add_argument("--output-dir", default=None, help="Directory for the exported xlsx (defaults to ~/Downloads).")
+    parser.add_argument("--dry-run", action="store_true", help="Scrape and export only; skip the history store, alerts and the CRM push.")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming scrape-to-CRM pipeline.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any unfinished run journal and start over.")
+    parser.add_argument("--no-skip-known", action="store_true", help="Scrape rows already present in the history store.")
+    parser.add_argument("--summary", default=None, help="Write the JSON run summary to this file instead of stdout.")
+    args = parser.parse_args(argv)
+    results = [run_year(year, args) for year in args.year]
+    ok = all(result['status'] == "success" for result in results)
+    summary = {'status': "success" if ok else "failed", 'runs': results, 'connections': connection_stats()}
+    summary = json.dumps(summary, indent=2, ensure_ascii=False, default=str)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(summary)
+        print(f"📄 Run summary written to {args.summary}")
+    else:
+        print(summary)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,17 +1,59 @@
+import os
 import re
+import shutil
+import PyPDF2
 import tempfile
 import pdfplumber
+import pypdfium2 as pdfium
 from pathlib import Path
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 
-def extract_text_from_pdf_bytesio(pdf_bytesio):
-    pdf_bytesio.seek(0)
+PDF_TEXT_ENGINE = os.getenv("PDF_TEXT_ENGINE", "pypdfium2")
+
+def pypdfium2_pages_text(pdf_bytesio, max_pages=None):
+    pdf = pdfium.PdfDocument(pdf_bytesio.getvalue())
+    try:
+        page_count = len(pdf) if max_pages is None else min(len(pdf), max_pages)
+        texts = []
+        for index in range(page_count):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_bounded().replace("\r\n", "\n").replace("\r", "\n"))
+            finally:
+                textpage.close()
+                page.close()
+        return texts
+    finally:
+        pdf.close()
+
+def pdfplumber_pages_text(pdf_bytesio, max_pages=None):
     with pdfplumber.open(pdf_bytesio) as pdf:
-        if len(pdf.pages) > 0:
-            first_page = pdf.pages[0]
-            return first_page.extract_text() or ""
-    return ""
+        pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
+        return [page.extract_text() or "" for page in pages]
+
+def pypdf2_pages_text(pdf_bytesio, max_pages=None):
+    reader = PyPDF2.PdfReader(pdf_bytesio)
+    pages = reader.pages if max_pages is None else reader.pages[:max_pages]
+    return [page.extract_text() or "" for page in pages]
+
+TEXT_ENGINES = {
+    "pypdfium2": pypdfium2_pages_text,
+    "pdfplumber": pdfplumber_pages_text,
+    "pypdf2": pypdf2_pages_text,
+}
+
+def extract_pages_text(pdf_bytesio, engine=None, max_pages=None):
+    engine = engine or PDF_TEXT_ENGINE
+    if engine not in TEXT_ENGINES:
+        raise ValueError(f"Unknown PDF text engine '{engine}'. Available engines: {list(TEXT_ENGINES)}")
+    pdf_bytesio.seek(0)
+    return TEXT_ENGINES[engine](pdf_bytesio, max_pages)
+
+def extract_text_from_pdf_bytesio(pdf_bytesio, engine=None):
+    pages = extract_pages_text(pdf_bytesio, engine, max_pages=1)
+    return pages[0] if pages else ""
 
 def normalize(text):
     if not text:
@@ -192,9 +234,22 @@ def extract_fields(text):
         }
         return default_fields
 
-def export_to_xlsx(data_list, year, urls, approved_links, approved_letter, architect_details):
+FIELD_ORDER = [
+    "File No.", "Planning Permission No.", "Permit No.",
+    "Date of permit", "Date of Application",
+    "Mobile No.", "Email ID",
+    "Applicant Name", "Applicant Address",
+    "Nature of Development", "Dwelling Unit Info",
+    "Site Address", "Area Name"
+]
+EXPORT_HEADERS = FIELD_ORDER + [
+    "Architect Name", "Architect Address", "Architect Email", "Architect Mobile",
+    "View Online", "Approved Plan", "Approval Letter"
+]
+
+def export_to_xlsx(data_list, year, urls, approved_links, approved_letter, architect_details, output_dir=None):
     try:
-        downloads_folder = Path.home() / "Downloads"
+        downloads_folder = Path(output_dir) if output_dir else Path.home() / "Downloads"
         downloads_folder.mkdir(parents=True, exist_ok=True)
         download_path = downloads_folder / f"CMDA_{year}.xlsx"
         temp_dir = Path(tempfile.gettempdir())
@@ -202,18 +257,7 @@ def export_to_xlsx(data_list, year, urls, approved_links, approved_letter, archi
         wb = Workbook()
         ws = wb.active
         ws.title = "Permit Data"
-        FIELD_ORDER = [
-            "File No.", "Planning Permission No.", "Permit No.",
-            "Date of permit", "Date of Application",
-            "Mobile No.", "Email ID",
-            "Applicant Name", "Applicant Address",
-            "Nature of Development", "Dwelling Unit Info",
-            "Site Address", "Area Name"
-        ]
-        headers = FIELD_ORDER + [
-            "Architect Name", "Architect Address", "Architect Email", "Architect Mobile",
-            "View Online", "Approved Plan", "Approval Letter"
-        ]
+        headers = EXPORT_HEADERS
         header_fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")
         header_font = Font(bold=True)
         for col_idx, header in enumerate(headers, start=1):
@@ -242,12 +286,14 @@ def export_to_xlsx(data_list, year, urls, approved_links, approved_letter, archi
                 letter_cell.hyperlink = letter_url
                 letter_cell.style = "Hyperlink"
         wb.save(download_path)
-        wb.save(temp_path)
+        # Same workbook in both places; copying skips serialising it a second time.
+        shutil.copyfile(download_path, temp_path)
         crm_url = f"file:///{temp_path.as_posix()}"
         return str(temp_path), str(download_path)
     except Exception as e:
         print(f"Error in export_to_xlsx: {e}")
-        downloads_folder = Path.home() / "Downloads"
+        downloads_folder = Path(output_dir) if output_dir else Path.home() / "Downloads"
+        downloads_folder.mkdir(parents=True, exist_ok=True)
         download_path = downloads_folder / f"CMDA_{year}_ERROR.xlsx"
         temp_dir = Path(tempfile.gettempdir())
         temp_path = temp_dir / f"CMDA_{year}_ERROR.xlsx"        
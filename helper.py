@@ -2,30 +2,51 @@ import os
 import re
 import smtplib
 import tempfile
+import numpy as np
 import pandas as pd
 from typing import Optional
 from datetime import datetime
 from dotenv import load_dotenv
+from pandas.io.parsers import TextParser
+from extractor import FIELD_ORDER, EXPORT_HEADERS
+from history_store import get_history_store, normalize_file_no
+from territory_index import get_territory_index
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 load_dotenv()
 
-def excel_to_json(file_path: str):
-    try:
-        df = pd.read_excel(file_path)
-        records = df.to_dict(orient="records")
-        cleaned_records = []
-        for record in records:
-            cleaned_record = {} 
-            for key, value in record.items():
-                if pd.notna(value):
-                    cleaned_record[key] = value
-            cleaned_records.append(cleaned_record)       
-        return cleaned_records   
-    except Exception as e:
-        print(f"Error in excel_to_json: {str(e)}")
-        return []
+def excel_cell(value):
+    """A cell as read_excel gets it back after to_excel: blanks as "" and integral floats as ints."""
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def excel_frame(columns, rows) -> pd.DataFrame:
+    """Build a DataFrame from worksheet cells with read_excel's own type inference, without writing an xlsx."""
+    data = [list(columns)] + [[excel_cell(value) for value in row] for row in rows]
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+def excel_types(df: pd.DataFrame) -> pd.DataFrame:
+    """The DataFrame a to_excel/read_excel round trip of df would return."""
+    return excel_frame(df.columns, df.itertuples(index=False, name=None))
+
+def export_row(data, architect) -> list:
+    """One export row's cells, in EXPORT_HEADERS order."""
+    return [str(data.get(key, "")) for key in FIELD_ORDER] + [
+        architect.get("name", ""), architect.get("address", ""), architect.get("email", ""), architect.get("mobile", ""),
+        "View PDF", "View Approved Plan", "View Approval Letter"
+    ]
+
+def export_sort_key(data) -> str:
+    return data.get("Area Name", "").strip().lower()
+
+def export_frame(data_list, architect_details) -> pd.DataFrame:
+    """The workbook export_to_xlsx writes, as read_excel would load it."""
+    combined_data = sorted(zip(data_list, architect_details), key=lambda x: export_sort_key(x[0]))
+    return excel_frame(EXPORT_HEADERS, [export_row(data, architect) for data, architect in combined_data])
 
 def send_unmatched_areas_alert(unmatched_df: pd.DataFrame, original_file_name: str = "input_file.xlsx") -> bool:
     try:
@@ -74,7 +95,7 @@ def send_unmatched_areas_alert(unmatched_df: pd.DataFrame, original_file_name: s
                     <p><strong>Action Required:</strong></p>
                     <ol>
                         <li>Review the attached Excel file containing all unmatched records</li>
-                        <li>Update the SALES_PERSON_AREAS mapping in the system if needed</li>
+                        <li>Update the territory map (territories.json) if needed</li>
                         <li>Manually assign salespeople to these areas</li>
                         <li>Reprocess the file after updates</li>
                     </ol>
@@ -121,155 +142,98 @@ def send_unmatched_areas_alert(unmatched_df: pd.DataFrame, original_file_name: s
         print(f"❌ Error in send_unmatched_areas_alert function: {str(e)}")
         return False
 
-def assign_sales_person_to_areas(excel_file_path: str, area_column_name: str = 'Area Name',
-                                 sales_person_column_name: str = 'Sales Person',
-                                 sheet_name: str = None, fuzzy_match_threshold: int = 100):
-    
-    SALES_PERSON_AREAS = {
-        "Abhishek R G": ["Adambakkam","Alandur", "Alandur Guindy", "Guindy", "Madipakkam","Keelkattalai","Medavakkam", "Nanganallur", "Pallikaranai", "Thalakananchery","Madambakkam", "Ward No. B of Nanganallur",
-            "Thalakkanancheri", "Thalakkananchery", "Thalakkancheri", "Velachery","Keezhkattalai","Keelkattalai"
-        ],
-        "Jagan": [
-            "Adyar", "Adayar","Athipattu", "Egmore", "Kottur", "Koyambedu","Triplicane","koyambedu", "Parutipattu", "Purasavakkam",
-            "Koyembedu", "Mogappair","Mogappiar", "Mullam", "Naduvakarai", "Naduvankarai","Naduvakkarai","Naduvankkarai", "Nekundram", "Nerkundram", "Nolambur", "Nungambakkam","Villivakkam",
-            "Pallipattu", "Part of Thirumangalam", "Periyakudal", "Alwarpet","Secretariat Colony Kilpauk Chennai.", "Urur", "Vada Agaram", "Vepery","Aminjikarai","Anna Nagar","part of Nungambakkam","Sembium"
-        ],          
-        "Karthik": [
-            "Arumbakkam", "Ayyappanthangal", "Ekkaduthangal", "Goparasanallur","Mugalivakkam","Kalikundram", "Kanagam", "Karambakkam", "Kodambakkam", "Kolapakkam", 
-            "Kulamanivakkam", "Madhananthapuram", "Madhandhapuram", "Manapakkam","Madhanandapuram",
-            "Mangadu-B", "Moulivakkam", "Noombal", "Pammal", "Panaveduthottam", 
-            "Parivakkam", "Porur", "Puliyur", "Saligramam", "Tharapakkam", "Ashok nagar", "Ashok Nagar",
-            "Valasaravakkam", "Virugambakkam", "Voyalanallur-A","Mambalam","K.K. Nagar","Kattupakkam"
-        ],
-        "Venkatesh": [
-            "Agaramthen", "Anakaputhur", "Chembarambakkam", "Cowl Bazaar","Ward No.B of Zamin Pallavaram",
-            "Gowrivakkam", "Karapakkam", "Kaspapuram", "Kulathuvancheri", 
-            "Kundrathur", "Kundrathur - A", "Kundrathur - B", "Kundrathur-A", 
-            "Kundrathur-B", "Malayambakkam", "Manancheri", "Mannivakkam","Nadambakkam", 
-            "Meppedu", "Mudichur", "Mullam", "Nandambakkam", "Nanmangalam", 
-            "Naduveerapattu", "Nedungundram", "Nedunkundram", "Nemilichery","Nemilicherry",
-            "Ottiyambakkam", "Palanthandalam", "Pallavaram", "Pallavarm", 
-            "Perumbakkam", "Perungalathur", "Rajakilpakkam", "S.Kulathur","Zameen Pallavaram",
-            "Selaiyur", "Sirukalathur", "Tambaram", "Thirumudivakkam","Siruvallur",
-            "Thiruneermalai", "Thiruvancheri", "Vandalur", "Varadarajapuram","Thiruvanchery",
-            "Varadharajapuram", "Vengaivasal", "Vengambakkam", "Sithalapakkam","Sithalapakkam",
-            "Ward No.C of Tambaram"
-        ],
-        "Dinakaran": [
-            "Kottivakkam", "Kovilambakkam", "Neelangarai", "Okkiam Thoraipakkam", 
-            "Okkiyam Thoraipakkam", "part of Sholinganallur", "Perungudi","Sholinganallu",
-            "Sholinganallur", "Thiiruvanmiyur", "Thiruvanmiyur", "Thoraipakkam","Palavakkam"
-        ],
-        "Balachander": [
-            "Agraharammel", "Angadu", "Layon Pullion", "Maduravoyal","Pulli Lyon","Sundarasolavaram","Ayapakkam" 
-        ],
-        "Jagan / Balachander": [
-            "Adayalampattu", "Alamathi", "Ambathur", "Ambattur", "Arumandai", 
-            "at Kondakarai Kuruvimedu Panchayat Road and", "at Orakkadu", 
-            "at Puzhal", "Ayanambakkam", "Ayanavaram", "Budur", "BUDUR", 
-            "Chintadripet", "Girudalapuram", "Kannapalayam", "Karanodai", 
-            "Karunakaracheri", "Kathirvedu", "Korattur", "Korattur A", "Kosapur", 
-            "Kovilpadagai", "Layon Grant", "Madhavaram", "Mijur", "Minjur", 
-            "Minjur II", "Nayar-II", "Nemam", "Oragadam", "Orakkadu", "Padi","Nemam-B",
-            "Padiyanallur", "Pakkam", "Palanjur", "Paleripattu", "part of Ayapakkam", 
-            "Paruthipattu", "Perambur", "Peravallur", "Periyamullaivoyal", 
-            "Perungavur", "Peruvallur", "Ponneri", "Purasaiwalkam", "Purasalwalkam", 
-            "Purursawalkkam", "Purusawalkam", "Seemapuram", "Sholavaram", 
-            "Sirugavoor", "Sothuperumbedu", "Thirumanam", "Thirunindravur B", 
-            "Thiruninravur", "Thiruninravur-A", "Thiruninravur-B", "Thiruvotriyur", 
-            "Tondairpet", "Tondiarpet", "Vanagaram", "Vayalanallur", "Vayalanallur-A", 
-            "Veeraragavapuram", "Veeraraghavapuram", "Venkatapuram", 
-            "Vilangadupakkam", "Villivakkam", "Paruthipattu","Villivkkam"
-        ],         
-        "Karthik / Venkatesh": [
-            "Gerugambakkam", "Kollacheri", "Kulappakkam", "Kuthambakkam", 
-            "Poonamallee", "Rendamkattalai", "Rendankattalai", "Sikkarayapuram", 
-            "Vellavedu", "Zamin Pallavaram", "Zamin Pallvaram", 
-            "Arasankalani", "Arasankazhani"
-        ],
-        "Jagan / Karthik": [
-            "Mylapore", "T Nagar", "T.Nagar","T-Nagar"
-        ],
-        "Venkatesh / Dinikaran": [
-            "Part Kottivakkam", "Semmancheri", "Semmanchery","Senjeri","Semmencheri"
-        ],
-    }
-    
-    def normalize_text(text: str) -> str:
-        if pd.isna(text) or text == "":
-            return ""
-        normalized = re.sub(r'[^\w\s]', '', str(text).strip().lower())
-        return re.sub(r'\s+', ' ', normalized)    
-    def find_best_match(area_name: str) -> Optional[str]:
-        if pd.isna(area_name) or area_name.strip() == "":
-            return None
-        normalized_area = normalize_text(area_name)
-        for sales_person, areas in SALES_PERSON_AREAS.items():
-            for mapped_area in areas:
-                normalized_mapped = normalize_text(mapped_area)
-                if normalized_area == normalized_mapped:
-                    return sales_person
-        return None    
-    def split_shared_assignments(df: pd.DataFrame, sales_col: str) -> pd.DataFrame:
-        shared_mask = df[sales_col].str.contains('/', na=False)
-        if not shared_mask.any():
-            return df
-        result_rows = []
-        for idx, row in df.iterrows():
-            sales_person = row[sales_col]
-            if pd.isna(sales_person) or '/' not in sales_person:
-                result_rows.append(row)
-            else:
-                salespeople = [sp.strip() for sp in sales_person.split('/')]
-                result_rows.append({
-                    'row': row,
-                    'salespeople': salespeople,
-                    'is_shared': True
-                })
-        final_rows = []
-        shared_groups = {}
-        for item in result_rows:
-            if isinstance(item, dict) and item.get('is_shared'):
-                key = ' / '.join(item['salespeople'])
-                if key not in shared_groups:
-                    shared_groups[key] = []
-                shared_groups[key].append(item['row'])
-            else:
-                final_rows.append(item)
-        for shared_key, rows in shared_groups.items():
-            salespeople = shared_key.split(' / ')
-            num_salespeople = len(salespeople)
-            num_records = len(rows)
-            if num_records == 1:
-                row_copy = rows[0].copy()
-                row_copy[sales_col] = salespeople[0]
-                final_rows.append(row_copy)
-            else:
-                records_per_person = num_records // num_salespeople
-                remainder = num_records % num_salespeople
-                start_idx = 0
-                for i, salesperson in enumerate(salespeople):
-                    count = records_per_person + (1 if i < remainder else 0)
-                    end_idx = start_idx + count
-                    
-                    for row in rows[start_idx:end_idx]:
-                        row_copy = row.copy()
-                        row_copy[sales_col] = salesperson
-                        final_rows.append(row_copy)
-                    start_idx = end_idx
-        return pd.DataFrame(final_rows).reset_index(drop=True)    
-    try:
-        if sheet_name:
-            df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
+# Size shared-territory blocks by each salesperson's assignments across runs (kept in the history store).
+SHARED_TERRITORY_BALANCE_BY_LOAD = os.getenv("SHARED_TERRITORY_BALANCE_BY_LOAD", "false").lower() in ("1", "true", "yes")
+
+LEAD_KEYWORDS = ["premium fsi","units","mall","theatre building","screens","dwelling units","dwellings","school building", "hospital", "college", "inst", "kalyana mandapam","auditorium","service apartment","service apartments","commercial building"]
+
+def find_sales_person(area_name: str, fuzzy_match_threshold: Optional[int] = None) -> Optional[str]:
+    return get_territory_index().lookup(area_name, fuzzy_match_threshold)
+
+def fuzzy_match_report(fuzzy_matches: dict) -> list:
+    report = [{'area': area, 'matched_area': match['matched_area'], 'sales_person': match['sales_person'], 'score': match['score']}
+              for area, match in fuzzy_matches.items()]
+    if report:
+        print(f"🔎 Fuzzy matched {len(report)} areas:")
+        for item in report:
+            print(f"  - {item['area']} → {item['matched_area']} ({item['sales_person']}, score {item['score']})")
+    return report
+
+def is_lead_candidate(record: dict) -> bool:
+    dwelling_info = record.get("Dwelling Unit Info")
+    if dwelling_info is not None and pd.notna(dwelling_info) and str(dwelling_info).strip() != "":
+        return True
+    nature_lower = str(record.get("Nature of Development")).lower().strip()
+    return any(k in nature_lower for k in LEAD_KEYWORDS)
+
+def shared_block_counts(salespeople: list, total: int, running_loads: Optional[dict] = None) -> list:
+    """How many of a shared territory's total records each salesperson gets, in list order."""
+    if running_loads is None:
+        per_person, remainder = divmod(total, len(salespeople))
+        return [per_person + (1 if i < remainder else 0) for i in range(len(salespeople))]
+    # Water-fill: give each record to the least-loaded salesperson, earlier listed first on ties.
+    loads = [running_loads.get(sp, 0) for sp in salespeople]
+    low, high = min(loads), min(loads) + total
+    while low < high:
+        level = (low + high + 1) // 2
+        if sum(max(0, level - load) for load in loads) <= total:
+            low = level
         else:
-            df = pd.read_excel(excel_file_path)
-        
+            high = level - 1
+    counts = [max(0, low - load) for load in loads]
+    remainder = total - sum(counts)
+    for i, load in enumerate(loads):
+        if remainder and load <= low:
+            counts[i] += 1
+            remainder -= 1
+    return counts
+
+def split_shared_assignments(df: pd.DataFrame, sales_col: str, running_loads: Optional[dict] = None) -> pd.DataFrame:
+    """Spread each shared territory's rows ("Jagan / Balachander") over its salespeople in contiguous blocks.
+
+    Unshared rows come first, then each shared group in order of first appearance. With running_loads
+    ({salesperson: records assigned so far}) the blocks are sized to even out those loads instead of the counts.
+    """
+    shared_mask = df[sales_col].str.contains('/', na=False)
+    if not shared_mask.any():
+        return df
+    shared = df[shared_mask]
+    keys = shared[sales_col].map(lambda sales_person: ' / '.join(sp.strip() for sp in sales_person.split('/')))
+    codes, group_keys = pd.factorize(keys)
+    positions = shared.groupby(codes).cumcount().to_numpy()
+    sizes = np.bincount(codes, minlength=len(group_keys))
+    loads = None
+    if running_loads is not None:
+        loads = dict(running_loads)
+        for sp, count in df.loc[~shared_mask, sales_col].value_counts().items():
+            loads[sp] = loads.get(sp, 0) + count
+    assigned = np.empty(len(shared), dtype=object)
+    for code, key in enumerate(group_keys):
+        salespeople = key.split(' / ')
+        counts = shared_block_counts(salespeople, int(sizes[code]), loads)
+        if loads is not None:
+            for sp, count in zip(salespeople, counts):
+                loads[sp] = loads.get(sp, 0) + count
+        in_group = codes == code
+        assigned[in_group] = np.array(salespeople, dtype=object)[np.searchsorted(np.cumsum(counts), positions[in_group], side='right')]
+    order = np.argsort(codes, kind='stable')
+    shared = shared.iloc[order].copy()
+    shared[sales_col] = assigned[order]
+    return pd.concat([df[~shared_mask], shared]).reset_index(drop=True)
+
+def assign_sales_person_frame(df: pd.DataFrame, area_column_name: str = 'Area Name',
+                              sales_person_column_name: str = 'Sales Person', fuzzy_match_threshold: Optional[int] = None,
+                              original_file_name: str = "input_file.xlsx") -> dict:
+    try:
         if area_column_name not in df.columns:
             available_columns = list(df.columns)
             raise ValueError(f"Column '{area_column_name}' not found. Available columns: {available_columns}")        
         result_df = df.copy()
-        result_df[sales_person_column_name] = result_df[area_column_name].apply(find_best_match)
-        result_df = split_shared_assignments(result_df, sales_person_column_name)        
+        fuzzy_matches = {}
+        result_df[sales_person_column_name] = get_territory_index().assign(result_df[area_column_name], fuzzy_match_threshold, fuzzy_matches)
+        fuzzy_matched_areas = fuzzy_match_report(fuzzy_matches)
+        running_loads = get_history_store().sales_loads() if SHARED_TERRITORY_BALANCE_BY_LOAD else None
+        result_df = split_shared_assignments(result_df, sales_person_column_name, running_loads)        
         matched_df = result_df[result_df[sales_person_column_name].notna()].copy()
         unmatched_df = result_df[result_df[sales_person_column_name].isna()].copy()        
         matched_count = len(matched_df)
@@ -281,13 +245,10 @@ def assign_sales_person_to_areas(excel_file_path: str, area_column_name: str = '
             distribution = matched_df[sales_person_column_name].value_counts()
             for sp, count in distribution.items():
                 print(f"  - {sp}: {count}")        
-        matched_temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-        matched_df.to_excel(matched_temp_file.name, index=False)
-        matched_file_path = matched_temp_file.name
-        matched_temp_file.close()        
+            if running_loads is not None:
+                get_history_store().add_sales_loads(distribution.to_dict())
         if unmatched_count > 0:
-            original_filename = os.path.basename(excel_file_path)
-            alert_sent = send_unmatched_areas_alert(unmatched_df, original_filename)
+            alert_sent = send_unmatched_areas_alert(unmatched_df, original_file_name)
             if alert_sent:
                 print(f"✅ Alert email sent successfully to {os.getenv('RECIPIENT_MAIL')}")
             else:
@@ -295,13 +256,14 @@ def assign_sales_person_to_areas(excel_file_path: str, area_column_name: str = '
         else:
             print("\n✅ All areas matched successfully! No unmatched records.")        
         return {
-            'matched_file_path': matched_file_path,
+            'matched_df': matched_df,
             'matched_count': matched_count,
             'unmatched_count': unmatched_count,
-            'unmatched_areas': unmatched_areas
+            'unmatched_areas': unmatched_areas,
+            'fuzzy_matched_areas': fuzzy_matched_areas
         }        
     except Exception as e:
-        print(f"❌ Error processing Excel file: {str(e)}")
+        print(f"❌ Error assigning sales persons: {str(e)}")
         raise e
 
 def send_records_alert(matched_df: pd.DataFrame, unmatched_df: pd.DataFrame, original_file_name: str = "input_file.xlsx") -> bool:
@@ -455,11 +417,9 @@ def send_records_alert(matched_df: pd.DataFrame, unmatched_df: pd.DataFrame, ori
         print(f"❌ Error in send_records_alert function: {str(e)}")
         return False
 
-def separate_and_store_temp(filepath, send_email=True):
-    keywords = ["premium fsi","units","mall","theatre building","screens","dwelling units","dwellings","school building", "hospital", "college", "inst", "kalyana mandapam","auditorium","service apartment","service apartments","commercial building"]
+def separate_records(df: pd.DataFrame, send_email=True, original_file_name: str = "input_file.xlsx"):
+    """Split df into lead candidates and the rest; returns (matched_df, unmatched_df, analysis_data)."""
     try:
-        df = pd.read_excel(filepath)
-        original_file_name = os.path.basename(filepath)
         required_cols = ["Dwelling Unit Info", "Nature of Development"]
         for col in required_cols:
             if col not in df.columns:
@@ -467,16 +427,10 @@ def separate_and_store_temp(filepath, send_email=True):
         cond1 = df["Dwelling Unit Info"].notna() & (df["Dwelling Unit Info"].astype(str).str.strip() != "")                
         nature_lower = df["Nature of Development"].astype(str).str.lower().str.strip()
         cond2 = df["Dwelling Unit Info"].isna() | (df["Dwelling Unit Info"].astype(str).str.strip() == "")
-        cond2 = cond2 & nature_lower.apply(lambda x: any(k in x for k in keywords))
+        cond2 = cond2 & nature_lower.apply(lambda x: any(k in x for k in LEAD_KEYWORDS))
         matched_df = df[cond1 | cond2]
         unmatched_df = df[~(cond1 | cond2)]        
-        matched_temp_file = tempfile.NamedTemporaryFile(delete=False, suffix="_matched.xlsx")
-        matched_df.to_excel(matched_temp_file.name, index=False)
-        print(f"✅ Matched data saved to: {matched_temp_file.name}")
         print(f"   Total matched records: {len(matched_df)}")        
-        unmatched_temp_file = tempfile.NamedTemporaryFile(delete=False, suffix="_unmatched.xlsx")
-        unmatched_df.to_excel(unmatched_temp_file.name, index=False)
-        print(f"✅ Unmatched data saved to: {unmatched_temp_file.name}")
         print(f"   Total unmatched records: {len(unmatched_df)}")        
         if send_email:
             print("\n📧 Sending email report with matched and unmatched records...")
@@ -498,29 +452,23 @@ def separate_and_store_temp(filepath, send_email=True):
         if not unmatched_df.empty and 'File No.' in unmatched_df.columns:
             unmatched_file_numbers = unmatched_df['File No.'].dropna().unique().tolist()
             analysis_data['unmatched_file_numbers'] = [str(fn) for fn in unmatched_file_numbers]        
-        return matched_temp_file.name, analysis_data        
+        return matched_df, unmatched_df, analysis_data        
     except Exception as e:
-        print(f"❌ Error in separate_and_store_temp: {e}")
-        return None, {}
+        print(f"❌ Error in separate_records: {e}")
+        return None, None, {}
 
-def assgin_leads_to_lead_name(file_path, zoho_auth):
-    try:                       
-        df = pd.read_excel(file_path)
-        records = df.to_dict('records')
+def create_leads_from_frame(df: pd.DataFrame, zoho_auth):
+    """Create Leads for every row of df; returns the per-row results, or None if the batch could not run."""
+    try:
         print("Creating Leads from CMDA records...")
-        leads_created = 0
-        for record in records:
-            if zoho_auth.create_lead_from_cmda_record(record):
-                leads_created += 1 
-        try:
-            os.unlink(file_path)
-        except:
-            pass
-        return True
+        results = zoho_auth.create_leads_from_cmda_records(df)
+        leads_created = sum(1 for result in results if result["status"] == "success")
+        print(f"Leads created: {leads_created}/{len(df)}")
+        return results
     except Exception as e:
-        print(f"❌ Error in process_and_push_to_zoho: {e}")
-        return False
-    
+        print(f"❌ Error in create_leads_from_frame: {e}")
+        return None
+
 def send_no_new_records_alert():
     try:
         sender_mail = os.getenv("SENDER_MAIL")
@@ -596,47 +544,51 @@ def send_no_new_records_alert():
         print(f"❌ Error sending email alert: {str(e)}")
         return False
 
-def compare_and_update_excel(new_file):
-    exist_file = "ExistData.xlsx"
-    key_col = "Planning Permission No."
+def load_known_file_numbers(file_numbers=None) -> set:
+    """Normalized File Nos. already in the history store; only those among file_numbers when given."""
     try:
-        if not os.path.exists(exist_file):
-            df = pd.read_excel(new_file)
-            df.to_excel(exist_file, index=False)
-            new_file_numbers = []
-            if 'File No.' in df.columns:
-                new_file_numbers = df['File No.'].dropna().unique().tolist()            
-            return True, {
-                'new_records_count': len(df),
-                'new_file_numbers': new_file_numbers
-            }        
-        if not os.path.exists(new_file):
-            raise FileNotFoundError(f"New data file not found: {new_file}")        
-        exist_df = pd.read_excel(exist_file)
-        new_df = pd.read_excel(new_file)        
-        if key_col not in exist_df.columns:
-            raise KeyError(f"Column '{key_col}' not found in {exist_file}")
-        if key_col not in new_df.columns:
-            raise KeyError(f"Column '{key_col}' not found in {new_file}")        
-        valid_new_df = new_df[~new_df[key_col].isin(["Failed", "Error", "Not Found"])]        
-        if valid_new_df.empty:
-            send_no_new_records_alert()
-            return False, {}        
-        new_entries = valid_new_df[~valid_new_df[key_col].isin(exist_df[key_col])]        
-        if new_entries.empty:
-            print("⚠️ No new records found.")
-            send_no_new_records_alert()
-            return False, {}        
-        updated_exist_df = pd.concat([exist_df, new_entries], ignore_index=True)
-        updated_exist_df.to_excel(exist_file, index=False)
-        new_entries.to_excel(new_file, index=False)        
-        new_file_numbers = []
-        if 'File No.' in new_entries.columns:
-            new_file_numbers = new_entries['File No.'].dropna().unique().tolist()        
-        return True, {
-            'new_records_count': len(new_entries),
-            'new_file_numbers': new_file_numbers
-        }
+        store = get_history_store()
+        if file_numbers is None:
+            return store.known_file_numbers()
+        return store.contains_file_numbers(file_numbers)
     except Exception as e:
-        print("Error in the compare_and_update_excel : ", str(e))
-        return False, {}
\ No newline at end of file
+        print(f"⚠️ Error loading known file numbers: {str(e)}")
+        return set()
+
+def load_known_planning_permissions() -> set:
+    try:
+        return get_history_store().known_planning_permissions()
+    except Exception as e:
+        print(f"⚠️ Error loading known planning permissions: {str(e)}")
+        return set()
+
+def append_to_exist_data(new_entries: pd.DataFrame) -> bool:
+    try:
+        get_history_store().append(new_entries)
+        return True
+    except Exception as e:
+        print(f"❌ Error appending to the history store: {str(e)}")
+        return False
+
+def compare_and_update_frame(new_df: pd.DataFrame):
+    """Record new_df's unseen Planning Permission Nos. in the history store; returns (new_entries, update_data), new_entries None when nothing is new."""
+    key_col = "Planning Permission No."
+    if key_col not in new_df.columns:
+        raise KeyError(f"Column '{key_col}' not found in the new data")        
+    valid_new_df = new_df[~new_df[key_col].isin(["Failed", "Error", "Not Found"])]        
+    if valid_new_df.empty:
+        send_no_new_records_alert()
+        return None, {}        
+    is_new = get_history_store().add_new(valid_new_df.to_dict(orient="records"))
+    new_entries = valid_new_df[is_new]        
+    if new_entries.empty:
+        print("⚠️ No new records found.")
+        send_no_new_records_alert()
+        return None, {}        
+    new_file_numbers = []
+    if 'File No.' in new_entries.columns:
+        new_file_numbers = new_entries['File No.'].dropna().unique().tolist()        
+    return new_entries.reset_index(drop=True), {
+        'new_records_count': len(new_entries),
+        'new_file_numbers': new_file_numbers
+    }
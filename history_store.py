@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+import pandas as pd
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "ExistData.sqlite")
+HISTORY_XLSX_PATH = os.getenv("HISTORY_XLSX_PATH", "ExistData.xlsx")
+KEY_COLUMN = "Planning Permission No."
+FILE_COLUMN = "File No."
+# Keep IN (...) lookups under SQLite's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 500
+
+def normalize_file_no(file_no) -> str:
+    if file_no is None or pd.isna(file_no):
+        return ""
+    return re.sub(r'\s+', '', str(file_no)).upper()
+
+def history_key(value):
+    if value is None or pd.isna(value):
+        return None
+    key = str(value).strip()
+    return key or None
+
+def _row_json(record):
+    return json.dumps({column: value for column, value in record.items() if not (pd.api.types.is_scalar(value) and pd.isna(value))},
+                      ensure_ascii=False, default=str)
+
+class HistoryStore:
+    """Every record already seen, keyed on Planning Permission No. with a File No. index; replaces ExistData.xlsx."""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    planning_permission_no TEXT PRIMARY KEY,
+                    file_no TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_records_file_no ON records(file_no)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sales_load (sales_person TEXT PRIMARY KEY, assigned INTEGER NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so _transaction controls BEGIN itself.
+            conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the database write lock up front, so concurrent runs check and insert one at a time."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _existing_keys(self, conn, keys):
+        keys = list(keys)
+        existing = set()
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+            rows = conn.execute(
+                f"SELECT planning_permission_no FROM records WHERE planning_permission_no IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def add_new(self, records, key_column=KEY_COLUMN):
+        """Store records whose key is not known yet; returns one flag per record, True where it was new (False for a missing key)."""
+        keys = [history_key(record.get(key_column)) for record in records]
+        now = time.time()
+        with self._transaction() as conn:
+            existing = self._existing_keys(conn, {key for key in keys if key is not None})
+            flags, rows, seen = [], [], set()
+            for key, record in zip(keys, records):
+                is_new = key is not None and key not in existing
+                flags.append(is_new)
+                if is_new and key not in seen:
+                    seen.add(key)
+                    rows.append((key, normalize_file_no(record.get(FILE_COLUMN)), _row_json(record), now))
+            conn.executemany("INSERT INTO records (planning_permission_no, file_no, data, created_at) VALUES (?, ?, ?, ?)", rows)
+        return flags
+
+    def append(self, df, key_column=KEY_COLUMN):
+        if df is None or df.empty:
+            return 0
+        return sum(self.add_new(df.to_dict(orient="records"), key_column))
+
+    def known_planning_permissions(self):
+        return {row[0] for row in self._connect().execute("SELECT planning_permission_no FROM records")}
+
+    def known_file_numbers(self):
+        return {row[0] for row in self._connect().execute("SELECT DISTINCT file_no FROM records WHERE file_no != ''")}
+
+    def contains_file_numbers(self, file_numbers):
+        conn = self._connect()
+        keys = list({normalize_file_no(file_no) for file_no in file_numbers} - {""})
+        found = set()
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+            rows = conn.execute(f"SELECT DISTINCT file_no FROM records WHERE file_no IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def sales_loads(self):
+        """Records assigned to each salesperson across runs, for balancing shared territories."""
+        return dict(self._connect().execute("SELECT sales_person, assigned FROM sales_load").fetchall())
+
+    def add_sales_loads(self, counts):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO sales_load (sales_person, assigned) VALUES (?, ?) "
+                "ON CONFLICT(sales_person) DO UPDATE SET assigned = assigned + excluded.assigned",
+                [(sales_person, int(count)) for sales_person, count in counts.items()]
+            )
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def get_meta(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def import_xlsx(self, xlsx_path=HISTORY_XLSX_PATH):
+        """Load an ExistData workbook; rows whose key is already stored are skipped, so re-running is harmless."""
+        df = pd.read_excel(xlsx_path)
+        if KEY_COLUMN not in df.columns:
+            raise KeyError(f"Column '{KEY_COLUMN}' not found in {xlsx_path}")
+        added = self.append(df)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_xlsx', ?)",
+                         (json.dumps({"path": os.path.abspath(xlsx_path), "rows": len(df), "added": added, "at": time.time()}),))
+        print(f"📚 Imported {added} of {len(df)} rows from {xlsx_path} into {self.path}")
+        return added
+
+    def export_frame(self):
+        rows = self._connect().execute("SELECT data FROM records ORDER BY rowid").fetchall()
+        # Columns keep the order they were first seen in, like the workbook they came from.
+        return pd.DataFrame([json.loads(row[0]) for row in rows])
+
+    def export_xlsx(self, output_path=HISTORY_XLSX_PATH):
+        df = self.export_frame()
+        df.to_excel(output_path, index=False)
+        print(f"📤 Exported {len(df)} records from {self.path} to {output_path}")
+        return len(df)
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+def get_history_store():
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            store = HistoryStore()
+            # One-time migration: seed a fresh store from the workbook it replaces.
+            if store.count() == 0 and store.get_meta("imported_xlsx") is None and os.path.exists(HISTORY_XLSX_PATH):
+                store.import_xlsx(HISTORY_XLSX_PATH)
+            _history_store = store
+        return _history_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the history of records already pushed (formerly ExistData.xlsx).")
+    parser.add_argument("command", choices=["status", "import", "export"])
+    parser.add_argument("--db", default=HISTORY_DB_PATH, help="History database path.")
+    parser.add_argument("--xlsx", default=HISTORY_XLSX_PATH, help="Workbook to import from or export to.")
+    args = parser.parse_args(argv)
+    store = HistoryStore(args.db)
+    if args.command == "import":
+        if not os.path.exists(args.xlsx):
+            print(f"❌ Workbook not found: {args.xlsx}")
+            return 1
+        store.import_xlsx(args.xlsx)
+    elif args.command == "export":
+        store.export_xlsx(args.xlsx)
+    else:
+        imported = store.get_meta("imported_xlsx")
+        print(json.dumps({"path": str(store.path), "records": store.count(), "sales_loads": store.sales_loads(),
+                          "imported_xlsx": json.loads(imported) if imported else None}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
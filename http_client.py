@@ -0,0 +1,270 @@
+import os
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv(
+    "HTTP_POOL_SIZE",
+    str(int(os.getenv("PERMIT_PDF_WORKERS", "8")) + int(os.getenv("APPROVAL_LETTER_WORKERS", "4")))
+))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "60"))
+CMDA_RATE_PER_SECOND = float(os.getenv("CMDA_RATE_PER_SECOND", "8"))
+CMDA_BURST = int(os.getenv("CMDA_BURST", "16"))
+CMDA_MAX_RETRIES = int(os.getenv("CMDA_MAX_RETRIES", "4"))
+CMDA_BACKOFF_BASE_SECONDS = float(os.getenv("CMDA_BACKOFF_BASE_SECONDS", "0.5"))
+CMDA_BACKOFF_MAX_SECONDS = float(os.getenv("CMDA_BACKOFF_MAX_SECONDS", "30"))
+CMDA_BREAKER_THRESHOLD = int(os.getenv("CMDA_BREAKER_THRESHOLD", "10"))
+CMDA_BREAKER_COOLDOWN_SECONDS = float(os.getenv("CMDA_BREAKER_COOLDOWN_SECONDS", "60"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+def counting_pool_class(pool_class, on_new_connection):
+    """pool_class, calling on_new_connection whenever urllib3 opens a connection."""
+    class CountingPool(pool_class):
+        def _new_conn(self):
+            on_new_connection()
+            return super()._new_conn()
+    return CountingPool
+
+class CountingAdapter(HTTPAdapter):
+    """Counts connections as they are opened, so pools the pool manager evicts (pool_connections hosts) still count."""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self.on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def _count_connections(self, manager):
+        manager.pool_classes_by_scheme = {
+            scheme: counting_pool_class(pool_class, self.on_new_connection)
+            for scheme, pool_class in manager.pool_classes_by_scheme.items()
+        }
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._count_connections(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if proxy in self.proxy_manager:
+            return self.proxy_manager[proxy]
+        return self._count_connections(super().proxy_manager_for(proxy, **proxy_kwargs))
+
+class PooledSession(requests.Session):
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)):
+        super().__init__()
+        self.timeout = timeout
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self.new_connections = 0
+        self.pool_size = 0
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size):
+        """Grow the per-host pool to pool_size so that many concurrent workers never discard connections."""
+        with self._count_lock:
+            if pool_size <= self.pool_size:
+                return
+            # Requests already running keep the old adapter; it is dropped once they finish.
+            adapter = CountingAdapter(self._count_new_connection, pool_connections=4, pool_maxsize=pool_size)
+            self.mount("https://", adapter)
+            self.mount("http://", adapter)
+            self.adapter = adapter
+            self.pool_size = pool_size
+
+    def _count_new_connection(self):
+        with self._count_lock:
+            self.new_connections += 1
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        with self._count_lock:
+            self.request_count += 1
+        return super().request(method, url, **kwargs)
+
+    def connection_stats(self):
+        return {'requests': self.request_count, 'new_connections': self.new_connections}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(name, pool_size=HTTP_POOL_SIZE):
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = PooledSession(pool_size)
+        else:
+            _sessions[name].ensure_pool_size(pool_size)
+        return _sessions[name]
+
+def reuse_rate(requests_count, new_connections):
+    return round(1 - new_connections / requests_count, 3) if requests_count else 0.0
+
+def connection_stats():
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    stats = {}
+    for name, session in sessions.items():
+        session_stats = session.connection_stats()
+        session_stats['reuse_rate'] = reuse_rate(session_stats['requests'], session_stats['new_connections'])
+        stats[name] = session_stats
+    return stats
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Errors worth retrying; they also count toward opening the circuit.
+TRANSIENT_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+class CircuitBreaker:
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_in_flight:
+                return False
+            # Half-open: let a single request through to probe the host.
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release(self):
+        """End a half-open trial that neither proved nor disproved the host (bad URL, redirect loop, ...)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.consecutive_failures >= self.threshold:
+                tripped = self.opened_at is None
+                self.opened_at = time.monotonic()
+                return tripped
+            return False
+
+class RateLimitedClient:
+
+    def __init__(self, name, rate=CMDA_RATE_PER_SECOND, burst=CMDA_BURST, max_retries=CMDA_MAX_RETRIES,
+                 backoff_base=CMDA_BACKOFF_BASE_SECONDS, backoff_max=CMDA_BACKOFF_MAX_SECONDS,
+                 breaker_threshold=CMDA_BREAKER_THRESHOLD, breaker_cooldown=CMDA_BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.session = get_session(name)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'breaker_trips': 0, 'bytes': 0, 'latency_ms': 0.0}
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(self.backoff_max, float(retry_after))
+        # Full jitter keeps parallel workers from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url, headers=None, timeout=30):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {self.name}, skipping {url}")
+            self.bucket.acquire()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout)
+                error = None
+            except TRANSIENT_ERRORS as e:
+                error = e
+            except BaseException as e:
+                # Not a sign the host is down, so no retry, but never leave the half-open trial claimed.
+                self.breaker.release()
+                if isinstance(e, requests.exceptions.RequestException):
+                    self._count(requests=1, failures=1, latency_ms=(time.perf_counter() - started) * 1000)
+                raise
+            latency_ms = (time.perf_counter() - started) * 1000
+            self._count(requests=1, latency_ms=latency_ms, bytes=len(response.content) if response is not None else 0)
+            if error is None and response.status_code not in RETRY_STATUS_CODES:
+                self.breaker.record_success()
+                return response
+            if self.breaker.record_failure():
+                self._count(breaker_trips=1)
+                print(f"⚠️ {self.name}: circuit opened after {self.breaker.consecutive_failures} consecutive failures")
+            if attempt >= self.max_retries:
+                self._count(failures=1)
+                if error is not None:
+                    raise error
+                return response
+            self._count(retries=1)
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['new_connections'] = self.session.connection_stats()['new_connections']
+        return stats
+
+def stats_delta(before, after):
+    delta = {key: value - before.get(key, 0) for key, value in after.items()}
+    delta['latency_ms'] = round(delta['latency_ms'], 1)
+    delta['mean_latency_ms'] = round(delta['latency_ms'] / delta['requests'], 1) if delta['requests'] else 0.0
+    delta['connection_reuse_rate'] = reuse_rate(delta['requests'], delta['new_connections'])
+    return delta
+
+_cmda_client = None
+_cmda_client_lock = threading.Lock()
+
+def get_cmda_client():
+    global _cmda_client
+    with _cmda_client_lock:
+        if _cmda_client is None:
+            _cmda_client = RateLimitedClient("cmdachennai.gov.in")
+        return _cmda_client
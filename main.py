@@ -1,17 +1,16 @@
 import os
 import sys
-import requests
-from io import BytesIO
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
-from urllib.parse import urljoin
 from Integration import lead_import
 from pdf_report import generate_pdf_report
-from playwright.sync_api import sync_playwright
+from scraper import PERMIT_PDF_WORKERS, APPROVAL_LETTER_WORKERS, discover_rows, scrape_year
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont, QMovie, QColor, QPalette, QPixmap
-from approved_letter import extract_registered_architect_from_bytes
-from extractor import extract_text_from_pdf_bytesio, extract_fields, export_to_xlsx
+from extractor import export_to_xlsx
+from helper import export_frame
+from pipeline import run_streaming_pipeline
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QComboBox,QMessageBox, QLabel, QGroupBox, QHBoxLayout, QSizePolicy, QSpacerItem, QProgressBar, QFileDialog)
 
 def setup_playwright_path():
@@ -33,149 +32,47 @@ def setup_playwright_path():
 
 setup_playwright_path()
 
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "false").lower() in ("1", "true", "yes")
+RESUME_RUNS = os.getenv("RESUME_RUNS", "true").lower() in ("1", "true", "yes")
+
 class ScrapeWorker(QThread):
     progress = pyqtSignal(int, int)
     finished = pyqtSignal(list, tuple)
     error = pyqtSignal(str)    
-    def __init__(self, year, entries):
+    def __init__(self, year, entries, permit_workers=PERMIT_PDF_WORKERS, letter_workers=APPROVAL_LETTER_WORKERS, skip_known=True, resume=RESUME_RUNS):
         super().__init__()
         self.year = year
         self.entries = entries
-        self.total_attempted = 0
-        self.successful_scraped = 0
-        self.failed_scraped = 0
-        self.failed_file_numbers = []
+        self.skip_known = skip_known
+        self.resume = resume
+        self.permit_workers = permit_workers
+        self.letter_workers = letter_workers
     def run(self):
-        url = f"https://cmdachennai.gov.in/OnlinePPAApprovalDetails/{self.year}.html"
-        entry_value = {'10': '10', '25': '25', '50': '50', 'All': '-1'}.get(self.entries, '10')
-        pdf_streams = []
-        urls = []
-        approved_plan_links = []
-        architect_details = []        
         try:
-            browser = None
-            playwright_instance = None            
-            try:
-                playwright_instance = sync_playwright().start()                
-                if getattr(sys, 'frozen', False):
-                    base_path = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
-                    chromium_path = os.path.join(base_path, 'ms-playwright', 'chromium-1187', 'chrome-win', 'chrome.exe')
-                    if os.path.exists(chromium_path):
-                        print(f"🚀 Launching browser with explicit path: {chromium_path}")
-                        browser = playwright_instance.chromium.launch(
-                            executable_path=chromium_path,
-                            headless=True
-                        )
-                    else:
-                        print("⚠️ Browser not found at explicit path, trying default...")
-                        browser = playwright_instance.chromium.launch(headless=True)
-                else:
-                    browser = playwright_instance.chromium.launch(headless=True)
-            except Exception as browser_error:
-                print(f"❌ Browser launch failed: {browser_error}")
-                if not playwright_instance:
-                    playwright_instance = sync_playwright().start()
-                browser = playwright_instance.chromium.launch(headless=True)            
-            if not browser:
-                self.error.emit("Failed to launch browser")
-                return       
-            page = browser.new_page()
-            page.goto(url, timeout=60000)
-            page.select_option('select[name="DataTables_Table_0_length"]', value=entry_value)
-            page.wait_for_timeout(3000)            
-            page.wait_for_selector('table tbody tr', timeout=30000)            
-            links = page.locator('table tbody tr td:nth-child(9) a')
-            approved_links = page.locator('table tbody tr td:nth-child(7) a')
-            approved_letter = page.locator('table tbody tr td:nth-child(6) a')
-            file_no_cells = page.locator('table tbody tr td:nth-child(2)')            
-            total = links.count()
-            self.total_attempted = total
-            approved_letter_links = []            
-            for i in range(total):
-                try:
-                    href = links.nth(i).get_attribute("href")
-                    approved_href = approved_links.nth(i).get_attribute("href")
-                    letter_href = approved_letter.nth(i).get_attribute("href")
-                    file_no_text = file_no_cells.nth(i).inner_text() if file_no_cells.count() > i else f"Unknown_{i+1}"
-                    if href and href.lower().endswith(".pdf"):
-                        full_url = urljoin("https://cmdachennai.gov.in/", href)
-                        approved_url = urljoin("https://cmdachennai.gov.in/", approved_href) if approved_href else ""
-                        letter_url = urljoin("https://cmdachennai.gov.in/", letter_href) if letter_href else ""
-                        try:
-                            r = requests.get(full_url, timeout=30)
-                            r.raise_for_status()
-                            pdf_io = BytesIO(r.content)
-                            text = extract_text_from_pdf_bytesio(pdf_io)
-                            fields = extract_fields(text)                            
-                            extracted_file_no = fields.get("File No.", file_no_text)                            
-                            if fields.get("File No.") in ["Not Found", "Error", ""] or not fields.get("File No."):
-                                self.failed_scraped += 1
-                                self.failed_file_numbers.append(extracted_file_no)
-                            else:
-                                self.successful_scraped += 1
-                            pdf_streams.append(fields)
-                            urls.append(full_url)
-                            approved_plan_links.append(approved_url)
-                            approved_letter_links.append(letter_url)                            
-                            if letter_url:
-                                try:
-                                    r_letter = requests.get(letter_url, timeout=30)
-                                    r_letter.raise_for_status()
-                                    letter_io = BytesIO(r_letter.content)
-                                    architect_info = extract_registered_architect_from_bytes(letter_io)
-                                    architect_details.append(architect_info)
-                                except Exception as e:
-                                    architect_details.append({"error": str(e), "status": "failure"})
-                        except requests.exceptions.RequestException as e:
-                            self.failed_scraped += 1
-                            self.failed_file_numbers.append(file_no_text)
-                            pdf_streams.append({
-                                "File No.": file_no_text,
-                                "Planning Permission No.": "Failed",
-                                "Permit No.": "Failed",
-                                "Date of permit": "Failed",
-                                "Date of Application": "Failed",
-                                "Mobile No.": "Failed",
-                                "Email ID": "Failed",
-                                "Applicant Name": "Failed",
-                                "Applicant Address": "Failed",
-                                "Nature of Development": "Failed",
-                                "Dwelling Unit Info": "",
-                                "Site Address": "Failed",
-                                "Area Name": "Failed"
-                            })
-                            urls.append(full_url)
-                            approved_plan_links.append(approved_url)
-                            approved_letter_links.append(letter_url)
-                            architect_details.append({"error": str(e), "status": "failure"})
-                        except Exception as e:
-                            print(f"⚠️ Processing failed: {e}")
-                            self.failed_scraped += 1
-                            self.failed_file_numbers.append(file_no_text)                
-                except Exception as e:
-                    print(f"⚠️ Error processing row {i+1}: {e}")
-                    self.failed_scraped += 1
-                    self.failed_file_numbers.append(f"Row_{i+1}")                
-                self.progress.emit(i + 1, total)            
-            browser.close()
-            if playwright_instance:
-                playwright_instance.stop()
-            scraping_stats = {
-                'total_attempted': self.total_attempted,
-                'successful_scraped': self.successful_scraped,
-                'failed_scraped': self.failed_scraped,
-                'failed_file_numbers': self.failed_file_numbers
-            }
-            if self.failed_file_numbers:
-                print(f"  Failed File Numbers: {', '.join(self.failed_file_numbers[:5])}")
-                if len(self.failed_file_numbers) > 5:
-                    print(f"    ... and {len(self.failed_file_numbers) - 5} more")
+            pdf_streams, urls, approved_plan_links, approved_letter_links, architect_details, scraping_stats = scrape_year(
+                self.year, self.entries, self.progress.emit, self.permit_workers, self.letter_workers,
+                skip_known=self.skip_known, resume=self.resume
+            )
             self.finished.emit(pdf_streams, (urls, approved_plan_links, approved_letter_links, architect_details, scraping_stats))
         except Exception as e:
             print(f"❌ Scraping error: {e}")
             self.error.emit(str(e))
-            if playwright_instance:
-                playwright_instance.stop()
+
+class PipelineWorker(QThread):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    def __init__(self, year, entries):
+        super().__init__()
+        self.year = year
+        self.entries = entries
+    def run(self):
+        try:
+            result = run_streaming_pipeline(self.year, self.entries, progress_callback=self.progress.emit)
+            self.finished.emit(result)
+        except Exception as e:
+            print(f"❌ Streaming pipeline error: {e}")
+            self.error.emit(str(e))
 
 class ScraperApp(QWidget):
 
@@ -484,24 +381,15 @@ class ScraperApp(QWidget):
     def update_row_count(self):
         if not self.selected_year:
             return False
-        url = f"https://cmdachennai.gov.in/OnlinePPAApprovalDetails/{self.selected_year}.html"
-        entry_value = {'10': '10', '25': '25', '50': '50', 'All': '-1'}.get(self.selected_entries, '10')
         self.loader.setVisible(True)
         if hasattr(self, 'loader_movie'):
             self.loader_movie.start()
         QApplication.processEvents()        
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, timeout=60000)
-                page.select_option('select[name="DataTables_Table_0_length"]', value=entry_value)
-                page.wait_for_timeout(2000)
-                rows = page.locator('table tbody tr').all_inner_texts()
-                self.row_count_label.setText(f"<span style='color: #000000;'> Total entries found: <b>{len(rows)}</b></span>")
-                self.row_count_label.setVisible(True)
-                browser.close()
-                return True
+            rows = discover_rows(self.selected_year, self.selected_entries)
+            self.row_count_label.setText(f"<span style='color: #000000;'> Total entries found: <b>{len(rows)}</b></span>")
+            self.row_count_label.setVisible(True)
+            return True
         except Exception as e:
             self.row_count_label.setText("<span style='color: #000000;'> Error fetching entry count.</span>")
             print(f"Error: {e}")
@@ -518,9 +406,13 @@ class ScraperApp(QWidget):
         self.loader.setVisible(True)
         if hasattr(self, 'loader_movie'):
             self.loader_movie.start()        
-        self.worker = ScrapeWorker(self.selected_year, self.selected_entries)
+        if STREAMING_PIPELINE:
+            self.worker = PipelineWorker(self.selected_year, self.selected_entries)
+            self.worker.finished.connect(self.on_pipeline_finished)
+        else:
+            self.worker = ScrapeWorker(self.selected_year, self.selected_entries)
+            self.worker.finished.connect(self.on_scrape_finished)
         self.worker.progress.connect(self.update_progress)
-        self.worker.finished.connect(self.on_scrape_finished)
         self.worker.error.connect(self.on_scrape_error)
         self.worker.start()
     
@@ -541,11 +433,24 @@ class ScraperApp(QWidget):
         )        
         self.temp_file_path = temp_path
         self.local_file_path = download_path        
-        import_result = lead_import(file_path=self.temp_file_path)
+        import_result = lead_import(file_path=self.temp_file_path, records=export_frame(pdfs, architect_details))
         self.crm_import_result = import_result        
         self.show_completion_message(len(pdfs), import_result, download_path)        
         self.report_btn.setVisible(True)
     
+    def on_pipeline_finished(self, result):
+        if hasattr(self, 'loader_movie'):
+            self.loader_movie.stop()
+        self.loader.setVisible(False)
+        self.scrape_btn.setEnabled(True)
+        self.progress.setVisible(False)
+        self.scraping_stats = result['scraping_stats']
+        self.temp_file_path = result['temp_path']
+        self.local_file_path = result['download_path']
+        self.crm_import_result = result['crm_result']
+        self.show_completion_message(result['records_count'], self.crm_import_result, self.local_file_path)
+        self.report_btn.setVisible(True)
+    
     def show_completion_message(self, pdf_count, import_result, download_path):
         success = import_result.get("status", False) if import_result else False        
         message = f"""
@@ -655,6 +560,7 @@ class ScraperApp(QWidget):
             QMessageBox.critical(self,"Error",f"An error occurred while generating the PDF report:\n{str(e)}")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = ScraperApp()
     window.showMaximized()
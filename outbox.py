@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() in ("1", "true", "yes")
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", str(Path.home() / ".cmda_cache" / "outbox.sqlite"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "60"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "21600"))
+
+class Outbox:
+
+    def __init__(self, path=OUTBOX_PATH, max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    module TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    upsert_field TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _backoff(self, attempts):
+        delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def add(self, module, payloads, errors, upsert_field=None):
+        if not payloads:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (module, payload, upsert_field, error, created_at, updated_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(module, json.dumps(payload, ensure_ascii=False, default=str), upsert_field, error, now, now, now)
+                 for payload, error in zip(payloads, errors)]
+            )
+        print(f"📥 Stored {len(payloads)} failed {module} records in the outbox")
+
+    def due(self, module=None, limit=1000, include_waiting=False):
+        query = "SELECT id, module, payload, upsert_field, attempts FROM outbox WHERE status = 'pending'"
+        params = []
+        if not include_waiting:
+            query += " AND next_attempt_at <= ?"
+            params.append(time.time())
+        if module:
+            query += " AND module = ?"
+            params.append(module)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [
+            {"id": row[0], "module": row[1], "payload": json.loads(row[2]), "upsert_field": row[3], "attempts": row[4]}
+            for row in rows
+        ]
+
+    def mark_sent(self, entry_ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sent', error = NULL, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(time.time(), entry_id) for entry_id in entry_ids]
+            )
+
+    def mark_failed(self, entry, error):
+        attempts = entry["attempts"] + 1
+        now = time.time()
+        status = "dead" if attempts >= self.max_attempts else "pending"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, error = ?, attempts = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+                (status, error, attempts, now, now + self._backoff(attempts), entry["id"])
+            )
+        return status
+
+    def next_attempt_at(self, module=None):
+        query = "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+        params = []
+        if module:
+            query += " AND module = ?"
+            params.append(module)
+        return self._connect().execute(query, params).fetchone()[0]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT module, status, COUNT(*) FROM outbox GROUP BY module, status").fetchall()
+        counts = {}
+        for module, status, count in rows:
+            counts.setdefault(module, {})[status] = count
+        return counts
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_outbox():
+    global _outbox
+    if not OUTBOX_ENABLED:
+        return None
+    with _outbox_lock:
+        if _outbox is None:
+            try:
+                _outbox = Outbox()
+            except Exception as e:
+                print(f"⚠️ Outbox unavailable, failed records will not be kept: {e}")
+                _outbox = False
+        return _outbox or None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or replay Zoho records that failed to push.")
+    parser.add_argument("command", choices=["status", "replay"])
+    parser.add_argument("--module", default=None, help="Only replay this Zoho module (e.g. Leads).")
+    parser.add_argument("--all", action="store_true", help="Replay pending records now, ignoring their backoff.")
+    parser.add_argument("--until-empty", action="store_true", help="Keep replaying, waiting out backoff, until nothing is pending.")
+    args = parser.parse_args(argv)
+    outbox = get_outbox()
+    if outbox is None:
+        print("❌ Outbox is disabled")
+        return 1
+    if args.command == "status":
+        print(json.dumps(outbox.counts(), indent=2))
+        return 0
+    from ZohoCRMAutomatedAuth import ZohoCRMAutomatedAuth
+    crm = ZohoCRMAutomatedAuth()
+    ignore_backoff = args.all
+    while True:
+        summary = crm.replay_outbox(module=args.module, ignore_backoff=ignore_backoff)
+        print(json.dumps(summary, indent=2))
+        if summary.get('error'):
+            # Nothing was attempted or rescheduled, so looping would retry the token flow immediately.
+            return 1
+        next_attempt_at = outbox.next_attempt_at(args.module)
+        if not args.until_empty or next_attempt_at is None:
+            break
+        ignore_backoff = False
+        time.sleep(max(0, next_attempt_at - time.time()))
+    remaining = sum(statuses.get("pending", 0) for module, statuses in outbox.counts().items() if not args.module or module == args.module)
+    return 0 if remaining == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from http_client import get_cmda_client
+
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", str(Path.home() / ".cmda_cache" / "pdf"))
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "1024"))
+
+class PdfCache:
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "index.sqlite"
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries(content_hash)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _blob_path(self, content_hash):
+        return self.blob_dir / content_hash[:2] / f"{content_hash}.pdf"
+
+    def _read_blob(self, content_hash):
+        try:
+            with open(self._blob_path(content_hash), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_blob(self, content_hash, content):
+        blob_path = self._blob_path(content_hash)
+        if blob_path.exists():
+            return
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=str(blob_path.parent), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, blob_path)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, url, timeout=30):
+        conn = self._connect()
+        entry = conn.execute(
+            "SELECT content_hash, etag, last_modified FROM entries WHERE url = ?", (url,)
+        ).fetchone()
+        cached_content = self._read_blob(entry[0]) if entry else None
+        headers = {}
+        if cached_content is not None:
+            if entry[1]:
+                headers['If-None-Match'] = entry[1]
+            if entry[2]:
+                headers['If-Modified-Since'] = entry[2]
+        response = get_cmda_client().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached_content is not None:
+            with conn:
+                conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._count('hits')
+            return cached_content
+        response.raise_for_status()
+        content = response.content
+        content_hash = hashlib.sha256(content).hexdigest()
+        self._write_blob(content_hash, content)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (url, content_hash, etag, last_modified, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, content_hash, response.headers.get('ETag'), response.headers.get('Last-Modified'), len(content), time.time())
+            )
+        self._count('misses')
+        self.evict()
+        return content
+
+    def evict(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY content_hash)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                conn.commit()
+                return
+            removed_hashes = []
+            for url, content_hash, size in conn.execute(
+                "SELECT url, content_hash, size FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                still_used = conn.execute(
+                    "SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (content_hash,)
+                ).fetchone()
+                if not still_used:
+                    total -= size
+                    removed_hashes.append(content_hash)
+                self._count('evictions')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for content_hash in removed_hashes:
+            try:
+                os.unlink(self._blob_path(content_hash))
+            except OSError:
+                pass
+
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+def get_pdf_cache():
+    global _pdf_cache
+    if not PDF_CACHE_ENABLED:
+        return None
+    with _pdf_cache_lock:
+        if _pdf_cache is None:
+            try:
+                _pdf_cache = PdfCache()
+            except Exception as e:
+                print(f"⚠️ PDF cache unavailable, downloading without it: {e}")
+                _pdf_cache = False
+        return _pdf_cache or None
+
+def fetch_pdf_bytes(url, timeout=30):
+    cache = get_pdf_cache()
+    if cache is not None:
+        return cache.get(url, timeout=timeout)
+    response = get_cmda_client().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
@@ -0,0 +1,34 @@
+from io import BytesIO
+from approved_letter import extract_registered_architect_from_bytes
+from extractor import extract_text_from_pdf_bytesio, extract_fields
+
+# Fields the rest of the run keys on (dedup, salesperson assignment, lead candidacy and naming); a fast-engine
+# parse missing any of them is compared against the fallback engine. Dwelling Unit Info is often legitimately empty.
+REQUIRED_FIELDS = ["File No.", "Planning Permission No.", "Area Name", "Applicant Name", "Nature of Development"]
+PERMIT_FALLBACK_ENGINE = "pdfplumber"
+LETTER_FALLBACK_ENGINE = "pypdf2"
+
+def missing_required_fields(fields):
+    return [field for field in REQUIRED_FIELDS if fields.get(field) in ("Not Found", "Error", "", None)]
+
+def parse_permit_pdf(pdf_bytes, engine=None):
+    try:
+        text = extract_text_from_pdf_bytesio(BytesIO(pdf_bytes), engine)
+        fields = extract_fields(text)
+    except Exception as e:
+        print(f"⚠️ Text engine failed on permit PDF, using {PERMIT_FALLBACK_ENGINE}: {e}")
+        fields = None
+    if fields is None or (missing_required_fields(fields) and engine != PERMIT_FALLBACK_ENGINE):
+        fallback_text = extract_text_from_pdf_bytesio(BytesIO(pdf_bytes), PERMIT_FALLBACK_ENGINE)
+        fallback_fields = extract_fields(fallback_text)
+        if fields is None or len(missing_required_fields(fallback_fields)) < len(missing_required_fields(fields)):
+            fields = fallback_fields
+    return fields
+
+def parse_approval_letter(letter_bytes, engine=None):
+    architect = extract_registered_architect_from_bytes(BytesIO(letter_bytes), engine)
+    if architect.get("status") != "success" and engine != LETTER_FALLBACK_ENGINE:
+        fallback_architect = extract_registered_architect_from_bytes(BytesIO(letter_bytes), LETTER_FALLBACK_ENGINE)
+        if fallback_architect.get("status") == "success":
+            return fallback_architect
+    return architect
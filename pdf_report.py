@@ -72,6 +72,7 @@ def generate_pdf_report(file_path, scraping_stats, crm_result, year, local_file_
             ["Total Records Attempted", str(scraping_stats.get('total_attempted', 0))],
             ["Successfully Scraped", str(scraping_stats.get('successful_scraped', 0))],
             ["Failed to Scrape", str(scraping_stats.get('failed_scraped', 0))],
+            ["Skipped (Already Known)", str(scraping_stats.get('skipped_known', 0))],
         ]        
         scraping_table = Table(scraping_data, colWidths=[3*inch, 2*inch])
         scraping_table.setStyle(TableStyle([
@@ -183,7 +184,14 @@ def generate_pdf_report(file_path, scraping_stats, crm_result, year, local_file_
                 elements.append(Paragraph(f"... and {len(unmatched_areas) - 10} more", list_style))
         else:
             elements.append(Paragraph("<b>Unmatched Areas Count:</b> 0", normal_style))
-        elements.append(Spacer(1, 40))        
+        fuzzy_matched_areas = analysis_data.get('fuzzy_matched_areas', [])
+        if fuzzy_matched_areas:
+            elements.append(Paragraph(f"<b>Fuzzy Matched Areas Count:</b> {len(fuzzy_matched_areas)}", normal_style))
+            for item in fuzzy_matched_areas[:10]:
+                elements.append(Paragraph(f"• {item['area']} → {item['matched_area']} ({item['sales_person']}, score {item['score']})", list_style))
+            if len(fuzzy_matched_areas) > 10:
+                elements.append(Paragraph(f"... and {len(fuzzy_matched_areas) - 10} more", list_style))
+        elements.append(Spacer(1, 40))
         footer_style = ParagraphStyle(
             'Footer',
             parent=styles['Normal'],
@@ -0,0 +1,385 @@
+import os
+import time
+import queue
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from extractor import EXPORT_HEADERS, export_to_xlsx
+from pdf_cache import fetch_pdf_bytes
+from http_client import get_cmda_client, stats_delta
+from pdf_extraction import parse_permit_pdf, parse_approval_letter
+from ZohoCRMAutomatedAuth import ZohoCRMAutomatedAuth
+from scraper import (PERMIT_PDF_WORKERS, APPROVAL_LETTER_WORKERS, PDF_EXTRACT_PROCESSES, discover_rows,
+                     skip_known_rows, failed_fields, submit_extraction, start_extract_pool)
+from helper import (SHARED_TERRITORY_BALANCE_BY_LOAD, excel_frame, export_row, export_sort_key, is_lead_candidate,
+                    fuzzy_match_report, split_shared_assignments, load_known_planning_permissions, append_to_exist_data,
+                    send_records_alert, send_unmatched_areas_alert, send_no_new_records_alert)
+from history_store import get_history_store, history_key
+from territory_index import get_territory_index
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "50"))
+STREAM_PUSH_BATCH_SIZE = int(os.getenv("STREAM_PUSH_BATCH_SIZE", "25"))
+STREAM_PUSH_FLUSH_SECONDS = float(os.getenv("STREAM_PUSH_FLUSH_SECONDS", "30"))
+INVALID_KEYS = ["Failed", "Error", "Not Found"]
+
+_DONE = object()
+
+def crm_record(fields, architect, sales_person=None):
+    """The record as its row of the export reads back (blanks as NaN, numbers typed), so both paths push the same payloads."""
+    record = excel_frame(EXPORT_HEADERS, [export_row(fields, architect)]).to_dict(orient="records")[0]
+    if sales_person:
+        record["Sales Person"] = sales_person
+    return record
+
+def file_numbers(records):
+    return [record["File No."] for record in records if pd.notna(record.get("File No."))]
+
+class StreamingPipeline:
+
+    def __init__(self, year, entries, permit_workers=None, letter_workers=None, extract_processes=None,
+                 skip_known=True, push_to_crm=True, progress_callback=None, queue_size=STREAM_QUEUE_SIZE, output_dir=None):
+        self.year = year
+        self.entries = entries
+        self.permit_workers = permit_workers or PERMIT_PDF_WORKERS
+        self.letter_workers = letter_workers or APPROVAL_LETTER_WORKERS
+        self.extract_processes = PDF_EXTRACT_PROCESSES if extract_processes is None else extract_processes
+        self.skip_known = skip_known
+        self.push_to_crm = push_to_crm
+        self.output_dir = output_dir
+        self.progress_callback = progress_callback
+        self.queue_size = queue_size
+        self.letter_slots = threading.BoundedSemaphore(self.letter_workers)
+        self.lock = threading.Lock()
+        self.total = 0
+        self.processed = 0
+        self.scraping_stats = {
+            'total_attempted': 0,
+            'successful_scraped': 0,
+            'failed_scraped': 0,
+            'failed_file_numbers': [],
+            'skipped_known': 0
+        }
+        self.export_rows = []
+        self.new_records = []
+        self.matched_records = []
+        self.unmatched_records = []
+        self.unmatched_area_records = []
+        self.fuzzy_matches = {}
+        self.shared_records = []
+        self.assigned_counts = {}
+        self.known_keys = set()
+        self.crm = None
+        self.crm_stats = {'cmda_batches': 0, 'cmda_failed_batches': 0, 'leads_created': 0, 'leads_failed': 0}
+        self.first_push_at = None
+        self.extract_pool = None
+        self.discover_error = None
+        self.stage_errors = []
+
+    def _stage_failed(self, name, error):
+        print(f"⚠️ {name} stage failed: {error}")
+        with self.lock:
+            self.stage_errors.append(f"{name}: {error}")
+
+    def _report_progress(self):
+        with self.lock:
+            self.processed += 1
+            processed, total = self.processed, self.total
+        if self.progress_callback:
+            self.progress_callback(processed, total)
+
+    def _start_stage(self, name, worker_count, handler, in_queue, out_queue):
+        remaining = [worker_count]
+        remaining_lock = threading.Lock()
+        def worker():
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    in_queue.put(_DONE)
+                    break
+                try:
+                    handler(item, out_queue)
+                except Exception as e:
+                    self._stage_failed(name, e)
+            with remaining_lock:
+                remaining[0] -= 1
+                last_worker = remaining[0] == 0
+            if last_worker and out_queue is not None:
+                out_queue.put(_DONE)
+        threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(worker_count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _discover(self, row_queue):
+        try:
+            rows = discover_rows(self.year, self.entries)
+            if self.skip_known:
+                rows, self.scraping_stats['skipped_known'] = skip_known_rows(rows)
+            with self.lock:
+                self.total = len(rows)
+                self.scraping_stats['total_attempted'] = len(rows)
+                for row in rows:
+                    if row.get("error"):
+                        self.scraping_stats['failed_scraped'] += 1
+                        self.scraping_stats['failed_file_numbers'].append(row["file_no"])
+            for row in rows:
+                if not row["pdf_url"]:
+                    self._report_progress()
+                    continue
+                row_queue.put(row)
+        except Exception as e:
+            # Re-raised by run() once the other stages have drained.
+            print(f"❌ Row discovery failed: {e}")
+            self.discover_error = e
+        finally:
+            row_queue.put(_DONE)
+
+    def _download(self, row, pdf_queue):
+        try:
+            pdf_bytes = fetch_pdf_bytes(row["pdf_url"], timeout=30)
+        except Exception as e:
+            pdf_queue.put((row, None, e, None))
+            return
+        letter = None
+        if row["letter_url"]:
+            with self.letter_slots:
+                try:
+                    letter = fetch_pdf_bytes(row["letter_url"], timeout=30)
+                except Exception as e:
+                    letter = {"error": str(e), "status": "failure"}
+        pdf_queue.put((row, pdf_bytes, None, letter))
+
+    def _extract(self, item, record_queue):
+        row, pdf_bytes, download_error, letter = item
+        file_no_text = row["file_no"]
+        try:
+            if download_error is not None:
+                raise download_error
+            fields = submit_extraction(self.extract_pool, parse_permit_pdf, pdf_bytes).result()
+            if isinstance(letter, bytes):
+                try:
+                    architect = submit_extraction(self.extract_pool, parse_approval_letter, letter).result()
+                except Exception as e:
+                    architect = {"error": str(e), "status": "failure"}
+            else:
+                architect = letter or {}
+            failed = fields.get("File No.") in ["Not Found", "Error", ""] or not fields.get("File No.")
+            failed_file_no = fields.get("File No.", file_no_text)
+        except Exception as e:
+            print(f"⚠️ Processing failed: {e}")
+            fields = failed_fields(file_no_text)
+            architect = {"error": str(e), "status": "failure"}
+            failed = True
+            failed_file_no = file_no_text
+        with self.lock:
+            if failed:
+                self.scraping_stats['failed_scraped'] += 1
+                self.scraping_stats['failed_file_numbers'].append(failed_file_no)
+            else:
+                self.scraping_stats['successful_scraped'] += 1
+        record_queue.put((row, fields, architect))
+        self._report_progress()
+
+    def _classify(self, item, dedup_queue):
+        row, fields, architect = item
+        record = crm_record(fields, architect)
+        candidate = is_lead_candidate(record)
+        match = get_territory_index().match(record.get("Area Name", "")) if candidate else None
+        sales_person = match['sales_person'] if match else None
+        if match and match['fuzzy']:
+            self.fuzzy_matches[record.get("Area Name")] = match
+        dedup_queue.put((row, fields, architect, record, candidate, sales_person))
+
+    def _dedup(self, item, push_queue):
+        row, fields, architect, record, candidate, sales_person = item
+        self.export_rows.append((fields, row["pdf_url"], row["approved_url"], row["letter_url"], architect))
+        key = history_key(record.get("Planning Permission No."))
+        if key is None or key in INVALID_KEYS or key in self.known_keys:
+            return
+        self.known_keys.add(key)
+        self.new_records.append(record)
+        if not candidate:
+            self.unmatched_records.append(record)
+            return
+        self.matched_records.append(record)
+        if not sales_person:
+            self.unmatched_area_records.append(record)
+        elif '/' in sales_person:
+            # Block sizes depend on how many records each shared territory gets, so these wait for the end of the run.
+            self.shared_records.append((export_sort_key(fields), dict(record, **{"Sales Person": sales_person})))
+        else:
+            self.assigned_counts[sales_person] = self.assigned_counts.get(sales_person, 0) + 1
+            push_queue.put(dict(record, **{"Sales Person": sales_person}))
+
+    def _split_shared(self):
+        """Assign the held shared-territory records exactly as assign_sales_person_frame would for this run's export."""
+        if not self.shared_records:
+            return []
+        # Same order as the export lead_import reads: by area name, then arrival.
+        records = [record for _, record in sorted(self.shared_records, key=lambda item: item[0])]
+        running_loads = None
+        if SHARED_TERRITORY_BALANCE_BY_LOAD:
+            running_loads = get_history_store().sales_loads()
+            for sales_person, count in self.assigned_counts.items():
+                running_loads[sales_person] = running_loads.get(sales_person, 0) + count
+        # dtype=object keeps each record's own cell types through the split.
+        assigned = split_shared_assignments(pd.DataFrame(records, dtype=object), "Sales Person", running_loads)
+        records = assigned.to_dict(orient="records")
+        for record in records:
+            self.assigned_counts[record["Sales Person"]] = self.assigned_counts.get(record["Sales Person"], 0) + 1
+        return records
+
+    def _flush_push(self, batch):
+        if self.first_push_at is None:
+            self.first_push_at = time.time()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            cmda_future = executor.submit(self.crm.push_records_to_zoho, batch)
+            leads_future = executor.submit(self.crm.create_leads_from_cmda_records, batch)
+        if cmda_future.result():
+            self.crm_stats['cmda_batches'] += 1
+        else:
+            self.crm_stats['cmda_failed_batches'] += 1
+        for result in leads_future.result():
+            if result["status"] == "success":
+                self.crm_stats['leads_created'] += 1
+            else:
+                self.crm_stats['leads_failed'] += 1
+
+    def _push(self, push_queue):
+        batch = []
+        batch_started = None
+        while True:
+            try:
+                item = push_queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                if self.crm is not None:
+                    batch += self._split_shared()
+                break
+            if item is not None:
+                if self.crm is None:
+                    continue
+                batch.append(item)
+                batch_started = batch_started or time.time()
+            if batch and (len(batch) >= STREAM_PUSH_BATCH_SIZE or time.time() - batch_started >= STREAM_PUSH_FLUSH_SECONDS):
+                self._safe_flush_push(batch)
+                batch = []
+                batch_started = None
+        for start in range(0, len(batch), STREAM_PUSH_BATCH_SIZE):
+            self._safe_flush_push(batch[start:start + STREAM_PUSH_BATCH_SIZE])
+
+    def _safe_flush_push(self, batch):
+        # Keep draining push_queue after a failed batch so the dedup stage never blocks on it.
+        try:
+            self._flush_push(batch)
+        except Exception as e:
+            self._stage_failed("push", e)
+
+    def run(self):
+        started_at = time.time()
+        get_cmda_client().session.ensure_pool_size(self.permit_workers + self.letter_workers)
+        http_stats_before = get_cmda_client().snapshot()
+        if self.push_to_crm:
+            self.crm = ZohoCRMAutomatedAuth()
+            if not self.crm.test_api_connection():
+                print("⚠️ API connection failed, streaming without CRM push")
+                self.crm = None
+        self.known_keys = load_known_planning_permissions()
+        row_queue = queue.Queue(maxsize=self.queue_size)
+        pdf_queue = queue.Queue(maxsize=self.queue_size)
+        record_queue = queue.Queue(maxsize=self.queue_size)
+        dedup_queue = queue.Queue(maxsize=self.queue_size)
+        push_queue = queue.Queue(maxsize=self.queue_size)
+        self.extract_pool = start_extract_pool(self.extract_processes)
+        try:
+            threads = [threading.Thread(target=self._discover, args=(row_queue,), name="discover", daemon=True)]
+            threads[0].start()
+            threads += self._start_stage("download", self.permit_workers, self._download, row_queue, pdf_queue)
+            threads += self._start_stage("extract", max(1, self.extract_processes), self._extract, pdf_queue, record_queue)
+            threads += self._start_stage("classify", 1, self._classify, record_queue, dedup_queue)
+            threads += self._start_stage("dedup", 1, self._dedup, dedup_queue, push_queue)
+            push_thread = threading.Thread(target=self._push, args=(push_queue,), name="push", daemon=True)
+            push_thread.start()
+            for thread in threads + [push_thread]:
+                thread.join()
+        finally:
+            if self.extract_pool is not None:
+                self.extract_pool.shutdown()
+        if self.discover_error is not None:
+            raise self.discover_error
+        self.scraping_stats['http'] = stats_delta(http_stats_before, get_cmda_client().snapshot())
+        result = self._export(started_at)
+        if self.stage_errors:
+            result['stage_errors'] = list(self.stage_errors)
+            result['crm_result'] = dict(result['crm_result'], status=False, statusCode=500,
+                                        message=f"{len(self.stage_errors)} pipeline stage failures; some records were not processed.")
+        return result
+
+    def _export(self, started_at):
+        fields_list, urls, approved_links, letter_links, architects = (
+            [list(column) for column in zip(*self.export_rows)] if self.export_rows else ([], [], [], [], [])
+        )
+        temp_path, download_path = export_to_xlsx(
+            fields_list, self.year, urls, approved_links, letter_links, architects, output_dir=self.output_dir
+        )
+        analysis_data = {
+            'new_records_count': len(self.new_records),
+            'new_file_numbers': file_numbers(self.new_records),
+            'matched_count': len(self.matched_records),
+            'unmatched_count': len(self.unmatched_records),
+            'matched_file_numbers': file_numbers(self.matched_records),
+            'unmatched_file_numbers': file_numbers(self.unmatched_records),
+            'unmatched_areas': sorted({str(r["Area Name"]) for r in self.unmatched_area_records if pd.notna(r.get("Area Name"))}),
+            'fuzzy_matched_areas': fuzzy_match_report(self.fuzzy_matches)
+        }
+        if not self.push_to_crm:
+            crm_result = {
+                "message": "CRM push skipped.",
+                "statusCode": 200,
+                "status": True,
+                "analysis_data": analysis_data
+            }
+        elif not self.new_records:
+            send_no_new_records_alert()
+            crm_result = {
+                "message": "No new records to process. Excel file is up to date.",
+                "statusCode": 200,
+                "status": True,
+                "analysis_data": analysis_data
+            }
+        else:
+            append_to_exist_data(pd.DataFrame(self.new_records))
+            original_file_name = os.path.basename(temp_path)
+            send_records_alert(pd.DataFrame(self.matched_records), pd.DataFrame(self.unmatched_records), original_file_name)
+            if self.unmatched_area_records:
+                send_unmatched_areas_alert(pd.DataFrame(self.unmatched_area_records), original_file_name)
+            if self.crm is None:
+                crm_ok, message = False, "API connection failed!"
+            else:
+                crm_ok = self.crm_stats['cmda_failed_batches'] == 0 and self.crm_stats['leads_failed'] == 0
+                if SHARED_TERRITORY_BALANCE_BY_LOAD and self.assigned_counts:
+                    get_history_store().add_sales_loads(self.assigned_counts)
+                message = "Records pushed to CMDA and Leads created successfully!" if crm_ok else "Failed to push some records to Zoho CRM"
+            crm_result = {
+                "message": message,
+                "statusCode": 200 if crm_ok else 400,
+                "status": crm_ok,
+                "analysis_data": analysis_data
+            }
+        self.scraping_stats['crm'] = dict(self.crm_stats)
+        if self.crm is not None:
+            self.scraping_stats['crm']['throughput'] = self.crm.scheduler.throughput()
+            self.scraping_stats['crm']['token'] = self.crm.token_manager.snapshot()
+        if self.first_push_at is not None:
+            self.scraping_stats['crm']['seconds_to_first_push'] = round(self.first_push_at - started_at, 1)
+        return {
+            'records_count': len(self.export_rows),
+            'temp_path': temp_path,
+            'download_path': download_path,
+            'scraping_stats': self.scraping_stats,
+            'crm_result': crm_result
+        }
+
+def run_streaming_pipeline(year, entries, **kwargs):
+    return StreamingPipeline(year, entries, **kwargs).run()
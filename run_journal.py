@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+from pathlib import Path
+from datetime import datetime
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+RUN_JOURNAL_DIR = os.getenv("RUN_JOURNAL_DIR", str(Path.home() / ".cmda_cache" / "runs"))
+
+class RunJournal:
+
+    def __init__(self, year, entries, journal_dir=RUN_JOURNAL_DIR):
+        self.path = Path(journal_dir) / f"CMDA_{year}_{entries}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.year = year
+        self.entries = entries
+        self.lock = threading.Lock()
+        self.file = None
+        self.lock_file = None
+
+    def _acquire(self):
+        """Hold an exclusive lock on the journal's .lock file so two runs of the same year and entries cannot share it."""
+        if self.lock_file is not None:
+            return
+        lock_file = open(self.path.with_suffix(".lock"), "a+")
+        try:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"Another run of {self.year} ({self.entries} entries) is in progress; {self.path.name} is locked")
+        self.lock_file = lock_file
+
+    def _release(self):
+        if self.lock_file is None:
+            return
+        if os.name == "nt":
+            self.lock_file.seek(0)
+            msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        self.lock_file.close()
+        self.lock_file = None
+
+    def _read_entries(self):
+        entries = []
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    def _resumable_entries(self):
+        entries = self._read_entries()
+        if not entries or entries[-1].get("type") == "complete":
+            return []
+        return entries
+
+    def load_completed_rows(self):
+        return {entry["pdf_url"]: entry for entry in self._resumable_entries() if entry.get("type") == "row"}
+
+    def start(self, resume=True):
+        self._acquire()
+        entries = self._resumable_entries() if resume else []
+        if not entries:
+            self.file = open(self.path, "w", encoding="utf-8")
+            self._write({"type": "start", "year": self.year, "entries": self.entries, "started_at": datetime.now().isoformat()})
+            return {}
+        # Rewrite the valid prefix so a torn last line cannot swallow the rows appended after it.
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        completed_rows = {entry["pdf_url"]: entry for entry in entries if entry.get("type") == "row"}
+        print(f"♻️ Resuming {self.path.name}: {len(completed_rows)} rows already processed")
+        return completed_rows
+
+    def _write(self, entry):
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def record(self, row, fields, architect):
+        self._write({
+            "type": "row",
+            "file_no": row["file_no"],
+            "pdf_url": row["pdf_url"],
+            "approved_url": row["approved_url"],
+            "letter_url": row["letter_url"],
+            "fields": fields,
+            "architect": architect
+        })
+
+    def complete(self):
+        if self.file is None:
+            self._acquire()
+            self.file = open(self.path, "a", encoding="utf-8")
+        self._write({"type": "complete", "completed_at": datetime.now().isoformat()})
+        self.close()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self._release()
@@ -0,0 +1,388 @@
+import os
+import re
+import sys
+import threading
+import requests
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from playwright.sync_api import sync_playwright
+from pdf_extraction import parse_permit_pdf, parse_approval_letter
+from helper import load_known_file_numbers, normalize_file_no
+from pdf_cache import fetch_pdf_bytes, get_pdf_cache
+from run_journal import RunJournal
+from http_client import get_cmda_client, stats_delta
+
+BASE_URL = "https://cmdachennai.gov.in/"
+PERMIT_PDF_WORKERS = int(os.getenv("PERMIT_PDF_WORKERS", "8"))
+APPROVAL_LETTER_WORKERS = int(os.getenv("APPROVAL_LETTER_WORKERS", "4"))
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(os.cpu_count() or 1)))
+ENTRY_VALUES = {'10': '10', '25': '25', '50': '50', 'All': '-1'}
+DATATABLE_ORDER = re.compile(r'["\']?(?:order|aaSorting)["\']?\s*:\s*\[\s*\[\s*(\d+)\s*,\s*["\'](asc|desc)["\']')
+DATATABLE_NO_ORDERING = re.compile(r'["\']?(?:ordering|bSort)["\']?\s*:\s*false')
+NUMERIC_CELL = re.compile(r'-?\d+(?:\.\d+)?')
+
+def year_url(year):
+    return f"{BASE_URL}OnlinePPAApprovalDetails/{year}.html"
+
+def build_row(file_no, href, approved_href, letter_href):
+    return {
+        "file_no": file_no,
+        "pdf_url": urljoin(BASE_URL, href) if href and href.lower().endswith(".pdf") else "",
+        "approved_url": urljoin(BASE_URL, approved_href) if approved_href else "",
+        "letter_url": urljoin(BASE_URL, letter_href) if letter_href else ""
+    }
+
+class ApprovalTableParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.in_tbody = False
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tbody":
+            self.in_tbody = True
+        elif tag == "tr" and self.in_tbody:
+            self.row = []
+        elif tag == "td" and self.row is not None:
+            self.cell = {"text": "", "href": None}
+        elif tag == "a" and self.cell is not None and self.cell["href"] is None:
+            self.cell["href"] = dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if tag == "tbody":
+            self.in_tbody = False
+        elif tag == "td" and self.cell is not None:
+            self.cell["text"] = self.cell["text"].strip()
+            self.row.append(self.cell)
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            if self.row:
+                self.rows.append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell["text"] += data
+
+def datatable_order(html):
+    """(column, descending) the page's DataTable initially sorts on, None when ordering is off; DataTables defaults to column 0 ascending."""
+    if DATATABLE_NO_ORDERING.search(html):
+        return None
+    match = DATATABLE_ORDER.search(html)
+    if match:
+        return int(match.group(1)), match.group(2) == "desc"
+    return 0, False
+
+def sort_like_datatable(table_rows, order):
+    """Rows in the order the DataTable displays them, so the first N match what the browser path reads."""
+    if order is None:
+        return table_rows
+    column, descending = order
+    texts = [cells[column]["text"] if column < len(cells) else "" for cells in table_rows]
+    # DataTables sorts a column numerically when every non-empty cell is a number, else as lower-cased text.
+    if all(not text or NUMERIC_CELL.fullmatch(text.replace(",", "")) for text in texts):
+        keys = [float(text.replace(",", "")) if text else float("-inf") for text in texts]
+    else:
+        keys = [text.lower() for text in texts]
+    # sorted() is stable in both directions, like DataTables' fallback to the original row index.
+    positions = sorted(range(len(table_rows)), key=keys.__getitem__, reverse=descending)
+    return [table_rows[position] for position in positions]
+
+def discover_rows_http(year, entries):
+    response = get_cmda_client().get(year_url(year), timeout=30)
+    response.raise_for_status()
+    parser = ApprovalTableParser()
+    parser.feed(response.text)
+    table_rows = [cells for cells in parser.rows if len(cells) >= 9]
+    if not table_rows:
+        return None
+    table_rows = sort_like_datatable(table_rows, datatable_order(response.text))
+    if entries != 'All':
+        table_rows = table_rows[:int(ENTRY_VALUES.get(entries, '10'))]
+    return [build_row(cells[1]["text"], cells[8]["href"], cells[6]["href"], cells[5]["href"]) for cells in table_rows]
+
+def launch_browser(playwright_instance):
+    try:
+        if getattr(sys, 'frozen', False):
+            base_path = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+            chromium_path = os.path.join(base_path, 'ms-playwright', 'chromium-1187', 'chrome-win', 'chrome.exe')
+            if os.path.exists(chromium_path):
+                print(f"🚀 Launching browser with explicit path: {chromium_path}")
+                return playwright_instance.chromium.launch(
+                    executable_path=chromium_path,
+                    headless=True
+                )
+            print("⚠️ Browser not found at explicit path, trying default...")
+        return playwright_instance.chromium.launch(headless=True)
+    except Exception as browser_error:
+        print(f"❌ Browser launch failed: {browser_error}")
+        return playwright_instance.chromium.launch(headless=True)
+
+BULK_ROWS_SCRIPT = """
+(limit) => {
+    const table = document.querySelector('table');
+    let trs = [];
+    if (window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable(table)) {
+        const api = jQuery(table).DataTable().rows({order: 'applied', search: 'applied'});
+        const nodes = api.nodes().toArray();
+        const data = api.data().toArray();
+        trs = data.map((cells, i) => {
+            if (nodes[i]) {
+                return nodes[i];
+            }
+            const tr = document.createElement('tr');
+            tr.innerHTML = (Array.isArray(cells) ? cells : Object.values(cells)).map(c => '<td>' + c + '</td>').join('');
+            return tr;
+        });
+    } else {
+        trs = Array.from(document.querySelectorAll('table tbody tr'));
+    }
+    if (limit > 0) {
+        trs = trs.slice(0, limit);
+    }
+    return trs.map(tr => {
+        const cells = tr.querySelectorAll('td');
+        const link = (n) => {
+            const a = cells[n] ? cells[n].querySelector('a') : null;
+            return a ? a.getAttribute('href') : null;
+        };
+        return {
+            file_no: cells[1] ? cells[1].textContent.trim() : null,
+            href: link(8),
+            approved_href: link(6),
+            letter_href: link(5)
+        };
+    });
+}
+"""
+
+def discover_rows_playwright(year, entries):
+    limit = int(ENTRY_VALUES.get(entries, '10'))
+    with sync_playwright() as playwright_instance:
+        browser = launch_browser(playwright_instance)
+        try:
+            page = browser.new_page()
+            page.goto(year_url(year), timeout=60000)
+            page.wait_for_selector('table tbody tr', timeout=30000)
+            raw_rows = page.evaluate(BULK_ROWS_SCRIPT, limit)
+        finally:
+            browser.close()
+    rows = []
+    for i, raw in enumerate(raw_rows):
+        try:
+            file_no_text = raw["file_no"] or f"Unknown_{i+1}"
+            rows.append(build_row(file_no_text, raw["href"], raw["approved_href"], raw["letter_href"]))
+        except Exception as e:
+            print(f"⚠️ Error processing row {i+1}: {e}")
+            rows.append({"file_no": f"Row_{i+1}", "pdf_url": "", "approved_url": "", "letter_url": "", "error": str(e)})
+    return rows
+
+def discover_rows(year, entries):
+    try:
+        rows = discover_rows_http(year, entries)
+        if rows is not None:
+            print(f"✅ Found {len(rows)} rows without a browser")
+            return rows
+        print("⚠️ No table rows in page HTML, falling back to browser...")
+    except Exception as e:
+        print(f"⚠️ HTTP table discovery failed ({e}), falling back to browser...")
+    return discover_rows_playwright(year, entries)
+
+def skip_known_rows(rows, known_file_numbers=None):
+    if known_file_numbers is None:
+        known_file_numbers = load_known_file_numbers([row["file_no"] for row in rows])
+    new_rows = [row for row in rows if normalize_file_no(row["file_no"]) not in known_file_numbers]
+    skipped = len(rows) - len(new_rows)
+    if skipped:
+        print(f"⏭️ Skipping {skipped} rows already in the history store")
+    return new_rows, skipped
+
+def failed_fields(file_no):
+    return {
+        "File No.": file_no,
+        "Planning Permission No.": "Failed",
+        "Permit No.": "Failed",
+        "Date of permit": "Failed",
+        "Date of Application": "Failed",
+        "Mobile No.": "Failed",
+        "Email ID": "Failed",
+        "Applicant Name": "Failed",
+        "Applicant Address": "Failed",
+        "Nature of Development": "Failed",
+        "Dwelling Unit Info": "",
+        "Site Address": "Failed",
+        "Area Name": "Failed"
+    }
+
+def submit_extraction(extract_pool, parse_function, pdf_bytes, slots=None):
+    """Extract in the pool (or inline without one); with slots, wait for a free one so downloaded PDFs cannot pile up unextracted."""
+    if extract_pool is not None:
+        if slots is None:
+            return extract_pool.submit(parse_function, pdf_bytes)
+        slots.acquire()
+        try:
+            future = extract_pool.submit(parse_function, pdf_bytes)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+    future = Future()
+    try:
+        future.set_result(parse_function(pdf_bytes))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def fetch_approval_letter(letter_url, extract_pool, extract_slots=None):
+    try:
+        letter_bytes = fetch_pdf_bytes(letter_url, timeout=30)
+        return submit_extraction(extract_pool, parse_approval_letter, letter_bytes, extract_slots)
+    except Exception as e:
+        return {"error": str(e), "status": "failure"}
+
+def fetch_permit(row, letter_pool, extract_pool, extract_slots=None):
+    pdf_bytes = fetch_pdf_bytes(row["pdf_url"], timeout=30)
+    fields_future = submit_extraction(extract_pool, parse_permit_pdf, pdf_bytes, extract_slots)
+    letter_future = (letter_pool.submit(fetch_approval_letter, row["letter_url"], extract_pool, extract_slots)
+                     if row["letter_url"] else None)
+    return fields_future, letter_future
+
+def architect_result(letter_future):
+    if letter_future is None:
+        return {}
+    letter_result = letter_future.result()
+    if isinstance(letter_result, dict):
+        return letter_result
+    try:
+        return letter_result.result()
+    except Exception as e:
+        return {"error": str(e), "status": "failure"}
+
+def start_extract_pool(extract_processes):
+    if extract_processes <= 0:
+        return None
+    try:
+        return ProcessPoolExecutor(max_workers=extract_processes)
+    except Exception as e:
+        print(f"⚠️ Could not start extraction processes, extracting in threads: {e}")
+        return None
+
+def scrape_rows(rows, progress_callback=None, permit_workers=None, letter_workers=None, extract_processes=None, journal=None, resume=True):
+    permit_workers = permit_workers or PERMIT_PDF_WORKERS
+    letter_workers = letter_workers or APPROVAL_LETTER_WORKERS
+    extract_processes = PDF_EXTRACT_PROCESSES if extract_processes is None else extract_processes
+    pdf_streams = []
+    urls = []
+    approved_plan_links = []
+    approved_letter_links = []
+    architect_details = []
+    stats = {
+        'total_attempted': len(rows),
+        'successful_scraped': 0,
+        'failed_scraped': 0,
+        'failed_file_numbers': [],
+        'resumed_rows': 0
+    }
+    total = len(rows)
+    completed_rows = journal.start(resume) if journal else {}
+    cache = get_pdf_cache()
+    cache_stats_before = dict(cache.stats) if cache else {}
+    get_cmda_client().session.ensure_pool_size(permit_workers + letter_workers)
+    http_stats_before = get_cmda_client().snapshot()
+    extract_pool = start_extract_pool(extract_processes)
+    # Bounds the PDFs waiting in the process pool to what the workers can hand over.
+    extract_slots = threading.BoundedSemaphore(permit_workers + max(1, extract_processes))
+    try:
+        with ThreadPoolExecutor(max_workers=letter_workers) as letter_pool, \
+                ThreadPoolExecutor(max_workers=permit_workers) as permit_pool:
+            futures = [
+                permit_pool.submit(fetch_permit, row, letter_pool, extract_pool, extract_slots)
+                if row["pdf_url"] and row["pdf_url"] not in completed_rows else None
+                for row in rows
+            ]
+            for i, (row, future) in enumerate(zip(rows, futures)):
+                if row["pdf_url"]:
+                    file_no_text = row["file_no"]
+                    try:
+                        if future is None:
+                            fields = completed_rows[row["pdf_url"]]["fields"]
+                            architect_info = completed_rows[row["pdf_url"]]["architect"]
+                            stats['resumed_rows'] += 1
+                        else:
+                            fields_future, letter_future = future.result()
+                            fields = fields_future.result()
+                            architect_info = architect_result(letter_future)
+                            if journal:
+                                journal.record(row, fields, architect_info)
+                        extracted_file_no = fields.get("File No.", file_no_text)
+                        if fields.get("File No.") in ["Not Found", "Error", ""] or not fields.get("File No."):
+                            stats['failed_scraped'] += 1
+                            stats['failed_file_numbers'].append(extracted_file_no)
+                        else:
+                            stats['successful_scraped'] += 1
+                    except requests.exceptions.RequestException as e:
+                        stats['failed_scraped'] += 1
+                        stats['failed_file_numbers'].append(file_no_text)
+                        fields = failed_fields(file_no_text)
+                        architect_info = {"error": str(e), "status": "failure"}
+                    except Exception as e:
+                        print(f"⚠️ Processing failed: {e}")
+                        stats['failed_scraped'] += 1
+                        stats['failed_file_numbers'].append(file_no_text)
+                        fields = failed_fields(file_no_text)
+                        architect_info = {"error": str(e), "status": "failure"}
+                    pdf_streams.append(fields)
+                    urls.append(row["pdf_url"])
+                    approved_plan_links.append(row["approved_url"])
+                    approved_letter_links.append(row["letter_url"])
+                    architect_details.append(architect_info)
+                if progress_callback:
+                    progress_callback(i + 1, total)
+    finally:
+        if extract_pool is not None:
+            extract_pool.shutdown()
+    if stats['resumed_rows']:
+        print(f"♻️ Reused {stats['resumed_rows']} rows from the run journal")
+    stats['http'] = stats_delta(http_stats_before, get_cmda_client().snapshot())
+    if cache:
+        stats['pdf_cache'] = {key: value - cache_stats_before.get(key, 0) for key, value in cache.stats.items()}
+    return pdf_streams, urls, approved_plan_links, approved_letter_links, architect_details, stats
+
+def scrape_year(year, entries, progress_callback=None, permit_workers=None, letter_workers=None,
+                extract_processes=None, skip_known=True, resume=True):
+    rows = discover_rows(year, entries)
+    skipped_known = 0
+    if skip_known:
+        rows, skipped_known = skip_known_rows(rows)
+    error_rows = [row["file_no"] for row in rows if row.get("error")]
+    journal = RunJournal(year, entries)
+    try:
+        pdf_streams, urls, approved_plan_links, approved_letter_links, architect_details, row_stats = scrape_rows(
+            rows, progress_callback, permit_workers, letter_workers, extract_processes, journal=journal, resume=resume
+        )
+        journal.complete()
+    finally:
+        # Releases the journal lock, also when the run fails part way.
+        journal.close()
+    failed_file_numbers = error_rows + row_stats['failed_file_numbers']
+    scraping_stats = {
+        'total_attempted': len(rows),
+        'successful_scraped': row_stats['successful_scraped'],
+        'failed_scraped': len(error_rows) + row_stats['failed_scraped'],
+        'failed_file_numbers': failed_file_numbers,
+        'skipped_known': skipped_known,
+        'resumed_rows': row_stats['resumed_rows']
+    }
+    scraping_stats['http'] = row_stats['http']
+    if 'pdf_cache' in row_stats:
+        scraping_stats['pdf_cache'] = row_stats['pdf_cache']
+    if failed_file_numbers:
+        print(f"  Failed File Numbers: {', '.join(failed_file_numbers[:5])}")
+        if len(failed_file_numbers) > 5:
+            print(f"    ... and {len(failed_file_numbers) - 5} more")
+    return pdf_streams, urls, approved_plan_links, approved_letter_links, architect_details, scraping_stats
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import time
+import warnings
+import threading
+from pathlib import Path
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+with warnings.catch_warnings():
+    # Without python-Levenshtein fuzzywuzzy warns and scores with difflib, which is fine for a handful of candidates.
+    warnings.simplefilter("ignore")
+    from fuzzywuzzy import fuzz
+
+TERRITORY_FILE = os.getenv("TERRITORY_FILE", "")
+TERRITORY_RELOAD_INTERVAL_SECONDS = float(os.getenv("TERRITORY_RELOAD_INTERVAL_SECONDS", "5"))
+BUNDLED_TERRITORY_FILE = Path(__file__).resolve().parent / "territories.json"
+# Lowest fuzz.ratio accepted for an area with no exact (normalized) match; 100 turns fuzzy matching off.
+# 88 resolves one-letter variants such as "Valasarawakkam" (93) but leaves "Madhandhapuram Extn" (85) unmatched; see benchmark_territory_index.py.
+AREA_FUZZY_MATCH_THRESHOLD = int(os.getenv("AREA_FUZZY_MATCH_THRESHOLD", "88"))
+AREA_FUZZY_CANDIDATES = int(os.getenv("AREA_FUZZY_CANDIDATES", "8"))
+AREA_FUZZY_CACHE_SIZE = 100000
+NGRAM_SIZE = 3
+
+def normalize_area_text(text: str) -> str:
+    if pd.isna(text) or text == "":
+        return ""
+    normalized = re.sub(r'[^\w\s]', '', str(text).strip().lower())
+    return re.sub(r'\s+', ' ', normalized)
+
+def area_ngrams(normalized):
+    padded = f" {normalized} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+def territory_file():
+    """TERRITORY_FILE if set, else a territories.json in the working directory (next to ExistData), else the bundled copy."""
+    if TERRITORY_FILE:
+        return Path(TERRITORY_FILE)
+    local = Path("territories.json")
+    return local if local.exists() else BUNDLED_TERRITORY_FILE
+
+class TerritoryIndex:
+    """Normalized area name -> salesperson, built once per version of the territory file."""
+
+    def __init__(self, territories, version=None, source=None):
+        self.territories = territories
+        self.version = version
+        self.source = source
+        self.by_area = {}
+        self.area_names = {}
+        for sales_person, areas in territories.items():
+            for area in areas:
+                key = normalize_area_text(area)
+                # First salesperson listed for an area wins, as with the old linear scan.
+                if key and key not in self.by_area:
+                    self.by_area[key] = sales_person
+                    self.area_names[key] = area
+        self.keys = list(self.by_area)
+        self.postings = {}
+        for position, key in enumerate(self.keys):
+            for gram in area_ngrams(key):
+                self.postings.setdefault(gram, []).append(position)
+        self._fuzzy_cache = {}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        territories = data["territories"]
+        if not isinstance(territories, dict) or not all(isinstance(areas, list) for areas in territories.values()):
+            raise ValueError(f"{path}: 'territories' must map each salesperson to a list of areas")
+        return cls(territories, data.get("version"), str(path))
+
+    def _best_fuzzy(self, key, threshold):
+        """Score only the areas sharing the most character trigrams with key; None when nothing reaches threshold or the best score is tied between salespeople."""
+        overlap = Counter()
+        for gram in area_ngrams(key):
+            for position in self.postings.get(gram, ()):
+                overlap[position] += 1
+        scored = []
+        for position, _ in overlap.most_common(AREA_FUZZY_CANDIDATES):
+            candidate = self.keys[position]
+            # fuzz.ratio cannot exceed this bound, so length alone rules some candidates out.
+            if 200 * min(len(key), len(candidate)) / (len(key) + len(candidate)) < threshold:
+                continue
+            score = fuzz.ratio(key, candidate)
+            if score >= threshold:
+                scored.append((score, candidate))
+        if not scored:
+            return None
+        best_score = max(score for score, _ in scored)
+        best = [candidate for score, candidate in scored if score == best_score]
+        if len({self.by_area[candidate] for candidate in best}) > 1:
+            return None
+        return best[0], best_score
+
+    def match(self, area_name, threshold=None):
+        """{'sales_person', 'matched_area', 'score', 'fuzzy'} for area_name, or None when it matches no territory."""
+        if area_name is None or pd.isna(area_name) or str(area_name).strip() == "":
+            return None
+        key = normalize_area_text(area_name)
+        if key in self.by_area:
+            return {'sales_person': self.by_area[key], 'matched_area': self.area_names[key], 'score': 100, 'fuzzy': False}
+        threshold = AREA_FUZZY_MATCH_THRESHOLD if threshold is None else threshold
+        if not key or threshold >= 100:
+            return None
+        cache_key = (key, threshold)
+        if cache_key not in self._fuzzy_cache:
+            if len(self._fuzzy_cache) >= AREA_FUZZY_CACHE_SIZE:
+                self._fuzzy_cache.clear()
+            self._fuzzy_cache[cache_key] = self._best_fuzzy(key, threshold)
+        best = self._fuzzy_cache[cache_key]
+        if best is None:
+            return None
+        candidate, score = best
+        return {'sales_person': self.by_area[candidate], 'matched_area': self.area_names[candidate], 'score': score, 'fuzzy': True}
+
+    def lookup(self, area_name, threshold=None):
+        match = self.match(area_name, threshold)
+        return match['sales_person'] if match else None
+
+    def assign(self, areas: pd.Series, threshold=None, fuzzy_matches=None) -> pd.Series:
+        """lookup() for every row, resolving each distinct area string once; fuzzy matches are recorded in fuzzy_matches[area] when given."""
+        codes, uniques = pd.factorize(areas)
+        matches = [self.match(area, threshold) for area in uniques]
+        if fuzzy_matches is not None:
+            fuzzy_matches.update((area, match) for area, match in zip(uniques, matches) if match and match['fuzzy'])
+        # Missing areas factorize to -1, which picks the trailing None.
+        resolved = np.array([match['sales_person'] if match else None for match in matches] + [None], dtype=object)
+        return pd.Series(resolved[codes], index=areas.index, dtype=object)
+
+_index = None
+_index_stamp = None
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+def get_territory_index():
+    """The current TerritoryIndex, reloaded when the territory file changes (checked every TERRITORY_RELOAD_INTERVAL_SECONDS)."""
+    global _index, _index_stamp, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < TERRITORY_RELOAD_INTERVAL_SECONDS:
+        return _index
+    with _index_lock:
+        if _index is not None and time.monotonic() - _checked_at < TERRITORY_RELOAD_INTERVAL_SECONDS:
+            return _index
+        path = territory_file()
+        stamp = None
+        try:
+            stamp = _file_stamp(path)
+            if stamp != _index_stamp:
+                index = TerritoryIndex.from_file(path)
+                print(f"🗺️ Loaded territory map v{index.version} from {path} ({len(index.by_area)} areas)")
+                _index, _index_stamp = index, stamp
+        except Exception as e:
+            if _index is None:
+                raise
+            print(f"⚠️ Keeping territory map v{_index.version}, reload of {path} failed: {e}")
+            # Do not retry the same broken file every interval; the next edit changes its stamp.
+            _index_stamp = stamp or _index_stamp
+        _checked_at = time.monotonic()
+        return _index
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from token_manager import ZOHO_TOKEN_REFRESH_MARGIN_SECONDS, get_token_manager
+
+ZOHO_TOKEN_BROKER_ENABLED = os.getenv("ZOHO_TOKEN_BROKER_ENABLED", "true").lower() in ("1", "true", "yes")
+ZOHO_TOKEN_BROKER_PORT = int(os.getenv("ZOHO_TOKEN_BROKER_PORT", "8765"))
+# The broker may have to run the OAuth browser flow before it can answer.
+ZOHO_TOKEN_BROKER_TIMEOUT_SECONDS = float(os.getenv("ZOHO_TOKEN_BROKER_TIMEOUT_SECONDS", "300"))
+
+def broker_key(auth):
+    return hashlib.sha256(f"{auth.client_id}:{auth.client_secret}".encode("utf-8")).hexdigest()
+
+class BrokerServer(ThreadingHTTPServer):
+    # On Windows SO_REUSEADDR lets a second process bind the same port, which would defeat the port race.
+    allow_reuse_address = os.name != "nt"
+    daemon_threads = True
+
+def make_handler(manager, key):
+
+    class TokenRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != "/token" or self.headers.get("X-Broker-Key") != key:
+                self.send_error(403)
+                return
+            stale_token = self.headers.get("X-Stale-Token")
+            if stale_token:
+                manager.invalidate(stale_token)
+            token = manager.get_token()
+            expires_at = manager.auth.token_expires_at
+            status = 200 if token else 503
+            body = json.dumps({
+                "access_token": token,
+                "expires_at": expires_at.isoformat() if token and expires_at else None
+            }).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TokenRequestHandler
+
+def start_broker(auth, port=ZOHO_TOKEN_BROKER_PORT):
+    """Serve tokens from this process if no broker is listening yet; returns the TokenManager or None."""
+    manager = get_token_manager(auth)
+    try:
+        server = BrokerServer(("127.0.0.1", port), make_handler(manager, broker_key(auth)))
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, name="zoho-token-broker", daemon=True).start()
+    print(f"🔑 Zoho token broker listening on 127.0.0.1:{port}")
+    return manager
+
+class BrokerClient:
+
+    def __init__(self, auth, port=ZOHO_TOKEN_BROKER_PORT, refresh_margin=ZOHO_TOKEN_REFRESH_MARGIN_SECONDS):
+        self.auth = auth
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}/token"
+        self.key = broker_key(auth)
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.lock = threading.Lock()
+        self.token = None
+        self.expires_at = None
+        self.local_manager = None
+        self.stats = {'broker_fetches': 0, 'broker_errors': 0}
+
+    def _is_fresh(self):
+        return self.token and (self.expires_at is None or datetime.now() < self.expires_at - self.refresh_margin)
+
+    def _fetch(self, stale_token=None):
+        headers = {"X-Broker-Key": self.key}
+        if stale_token:
+            headers["X-Stale-Token"] = stale_token
+        response = requests.get(self.url, headers=headers, timeout=(2, ZOHO_TOKEN_BROKER_TIMEOUT_SECONDS))
+        self.stats['broker_fetches'] += 1
+        if response.status_code != 200:
+            self.stats['broker_errors'] += 1
+            print(f"❌ Token broker returned {response.status_code}")
+            return None
+        data = response.json()
+        self.token = data.get("access_token")
+        self.expires_at = datetime.fromisoformat(data["expires_at"]) if data.get("expires_at") else None
+        self.auth.token_expires_at = self.expires_at
+        return self.token
+
+    def get_token(self):
+        if self.local_manager is not None:
+            return self.local_manager.get_token()
+        if self._is_fresh():
+            return self.token
+        with self.lock:
+            if self._is_fresh():
+                return self.token
+            try:
+                return self._fetch()
+            except requests.exceptions.ConnectionError:
+                # No broker yet (or it exited): serve from this process, or use whoever won the port race.
+                self.local_manager = start_broker(self.auth, self.port)
+                if self.local_manager is not None:
+                    return self.local_manager.get_token()
+                try:
+                    return self._fetch()
+                except requests.exceptions.RequestException as e:
+                    self.stats['broker_errors'] += 1
+                    print(f"❌ Token broker unavailable: {e}")
+                    return None
+            except requests.exceptions.RequestException as e:
+                self.stats['broker_errors'] += 1
+                print(f"❌ Token broker request failed: {e}")
+                return None
+
+    def invalidate(self, token):
+        """Zoho rejected token (401): have the broker refresh it unless it already serves a newer one."""
+        if self.local_manager is not None:
+            self.local_manager.invalidate(token)
+            return
+        with self.lock:
+            if self.token != token:
+                return
+            self.token = None
+            try:
+                self._fetch(stale_token=token)
+            except requests.exceptions.RequestException as e:
+                self.stats['broker_errors'] += 1
+                print(f"❌ Token broker request failed: {e}")
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        if self.local_manager is not None:
+            stats.update(self.local_manager.snapshot())
+        stats['hosting_broker'] = self.local_manager is not None
+        return stats
+
+_broker_clients = {}
+_broker_clients_lock = threading.Lock()
+
+def get_token_source(auth):
+    if not ZOHO_TOKEN_BROKER_ENABLED:
+        return get_token_manager(auth)
+    with _broker_clients_lock:
+        if auth.client_id not in _broker_clients:
+            _broker_clients[auth.client_id] = BrokerClient(auth)
+        return _broker_clients[auth.client_id]
+
+def main():
+    from ZohoCRMAutomatedAuth import ZohoCRMAutomatedAuth
+    auth = ZohoCRMAutomatedAuth()
+    manager = start_broker(auth)
+    if manager is None:
+        print(f"❌ Port {ZOHO_TOKEN_BROKER_PORT} is already in use; another token broker is probably running.")
+        return 1
+    if not manager.get_token():
+        print("⚠️ No valid token yet; the broker will retry when clients ask for one.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        manager.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+ZOHO_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("ZOHO_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+ZOHO_TOKEN_BACKGROUND_REFRESH = os.getenv("ZOHO_TOKEN_BACKGROUND_REFRESH", "true").lower() in ("1", "true", "yes")
+
+@contextmanager
+def token_file_lock(token_file):
+    """Exclusive cross-process lock on TOKEN_FILE_NAME while it is re-read, refreshed and rewritten."""
+    if not token_file:
+        yield
+        return
+    with open(f"{token_file}.lock", "a+") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+class TokenManager:
+    """Keeps one Zoho access token in memory and refreshes it once per expiry window for every caller."""
+
+    def __init__(self, auth, refresh_margin=ZOHO_TOKEN_REFRESH_MARGIN_SECONDS, background=ZOHO_TOKEN_BACKGROUND_REFRESH):
+        self.auth = auth
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.background = background
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.stop_event = threading.Event()
+        self.refresher = None
+        self.stats = {'refreshes': 0, 'refresh_failures': 0, 'oauth_flows': 0, 'file_reloads': 0, 'invalidations': 0,
+                      'refresh_ms_total': 0.0, 'last_refresh_ms': 0.0}
+
+    def _is_fresh(self):
+        if not self.auth.access_token:
+            return False
+        expires_at = self.auth.token_expires_at
+        return expires_at is None or datetime.now() < expires_at - self.refresh_margin
+
+    def _is_expired(self):
+        expires_at = self.auth.token_expires_at
+        return not self.auth.access_token or (expires_at is not None and datetime.now() >= expires_at)
+
+    def get_token(self):
+        if self._is_fresh():
+            self._start_refresher()
+            return self.auth.access_token
+        with self.lock:
+            if not self.loaded:
+                self.auth.load_tokens()
+                self.loaded = True
+            if not self._is_fresh():
+                self._refresh_locked()
+            token = None if self._is_expired() else self.auth.access_token
+        if token:
+            self._start_refresher()
+        return token
+
+    def invalidate(self, token):
+        """Zoho rejected token (401): refresh now unless another caller already replaced it."""
+        with self.lock:
+            if self.auth.access_token != token:
+                return
+            self.stats['invalidations'] += 1
+            self._refresh_locked(stale_token=token)
+
+    def _refresh_locked(self, stale_token=None):
+        started = time.perf_counter()
+        with token_file_lock(self.auth.token_file):
+            # Another process may have refreshed while we waited for the file lock.
+            if os.path.exists(self.auth.token_file or ""):
+                self.auth.load_tokens()
+            if self._is_fresh() and self.auth.access_token != stale_token:
+                self.stats['file_reloads'] += 1
+                return
+            refreshed = False
+            if self.auth.refresh_token:
+                refreshed = self.auth.refresh_access_token()
+                self.stats['refreshes' if refreshed else 'refresh_failures'] += 1
+            if not refreshed and (self._is_expired() or self.auth.access_token == stale_token):
+                print("Token refresh failed, starting OAuth flow...")
+                self.stats['oauth_flows'] += 1
+                self.auth.automate_oauth_flow()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats['refresh_ms_total'] += elapsed_ms
+        self.stats['last_refresh_ms'] = round(elapsed_ms, 1)
+
+    def _start_refresher(self):
+        if not self.background or self.refresher is not None:
+            return
+        with self.lock:
+            if self.refresher is None:
+                self.refresher = threading.Thread(target=self._refresh_loop, name="zoho-token-refresher", daemon=True)
+                self.refresher.start()
+
+    def _refresh_loop(self):
+        while not self.stop_event.is_set():
+            expires_at = self.auth.token_expires_at
+            if expires_at is None:
+                return
+            wait = (expires_at - self.refresh_margin - datetime.now()).total_seconds()
+            if wait > 0:
+                self.stop_event.wait(wait)
+                continue
+            with self.lock:
+                if not self._is_fresh():
+                    self._refresh_locked()
+            if not self._is_fresh():
+                # Refresh did not move the expiry forward; retry shortly instead of spinning.
+                self.stop_event.wait(30)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        attempts = stats['refreshes'] + stats['refresh_failures'] + stats['oauth_flows']
+        refresh_ms_total = stats.pop('refresh_ms_total')
+        stats['mean_refresh_ms'] = round(refresh_ms_total / attempts, 1) if attempts else 0.0
+        return stats
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(auth):
+    key = (auth.client_id, auth.token_file)
+    with _token_managers_lock:
+        if key not in _token_managers:
+            _token_managers[key] = TokenManager(auth)
+        return _token_managers[key]
@@ -0,0 +1,284 @@
+from datetime import datetime
+import pandas as pd
+
+# Same order as the field_mapping in benchmark_zoho_formatter.legacy_format_record_for_zoho; payload keys follow it.
+CMDA_FIELD_MAPPING = {
+    "Sales Person": "Lead_Owner",
+    "Email ID": "Email",
+    "Mobile No.": "Mobile_Number",
+    "Date of permit": "Date_of_Permit",
+    "Applicant Name": "Lead_Name",
+    "Nature of Development": "Nature_of_Developments",
+    "Dwelling Unit Info": "Dwelling_Unit_Info",
+    "Reference": "Reference",
+    "Company_Name": "Company_Name",
+    "Architect Name": "Architect",
+    "Planning Permission No.": "Plan_Permission",
+    "Applicant Address": "Applicant_Address",
+    "Future_Projects": "Future_Project",
+    "Creation_Time": "Creation_Time",
+    "Which_Brand_Looking_for": "Which_Brand_Looking_for",
+    "How_Much_Square_Feet": "How_Much_Square_Feet",
+    "Area Name": "Area_Name",
+    "Site Address": "Site_Address"
+}
+CMDA_LONG_FIELDS = ["Applicant_Address", "Site_Address", "Nature_of_Developments", "Architect"]
+# legacy_build_lead_data reads these with a non-empty default when the key is absent from the record.
+LEAD_FIELD_DEFAULTS = {"Architect Mobile": "Not Provided"}
+FIRST_NUMBER = r'(\d+)'
+BLANK_VALUES = ['', 'nan', 'none', 'null']
+
+def records_to_frame(records, defaults=None):
+    """DataFrame of the original Python values, keeping dict.get defaults for keys a record does not have."""
+    frame = pd.DataFrame(records, dtype=object)
+    for column, default in (defaults or {}).items():
+        if column in frame.columns:
+            absent = [column not in record for record in records]
+            if any(absent):
+                frame.loc[absent, column] = default
+    return frame
+
+def _column(df, name, default=None):
+    if name in df.columns:
+        return df[name].astype(object)
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+def _text(series):
+    return pd.Series([str(value) for value in series.tolist()], index=series.index, dtype=object)
+
+def _truthy(series):
+    return pd.Series([bool(value) for value in series.tolist()], index=series.index, dtype=bool)
+
+def _per_distinct(strings, transform):
+    """Run a vectorized string transform over the distinct strings only and broadcast the results back."""
+    codes, uniques = pd.factorize(strings)
+    results = transform(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(results[codes], index=strings.index, dtype=object)
+
+def _strip(strings):
+    return _per_distinct(strings, lambda distinct: distinct.str.strip())
+
+def _first_number(strings):
+    """re.findall(r'\\d+', text)[0] per row, NaN where the text has no digits."""
+    return _per_distinct(strings, lambda distinct: distinct.str.extract(FIRST_NUMBER, expand=False))
+
+def _map_unique(strings, function):
+    """Apply function once per distinct string instead of once per row."""
+    lookup = {value: function(value) for value in pd.unique(strings)}
+    return pd.Series([lookup[value] for value in strings.tolist()], index=strings.index, dtype=object)
+
+def _memo_map(series, function, errors=None):
+    """Apply function once per distinct (type, value); failures land in errors by row position when given."""
+    cache = {}
+    results = []
+    for position, value in zip(series.index, series.tolist()):
+        key = (type(value), value)
+        try:
+            if key in cache:
+                results.append(cache[key])
+                continue
+        except TypeError:
+            key = None
+        try:
+            result = function(value)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors[position] = e
+            result = None
+        else:
+            if key is not None:
+                cache[key] = result
+        results.append(result)
+    return pd.Series(results, index=series.index, dtype=object)
+
+def _truncate(stripped, max_length):
+    """truncate_field over strings that are already stripped; only the over-long ones are touched."""
+    too_long = stripped.str.len() > max_length
+    if not too_long.any():
+        return stripped
+    stripped = stripped.copy()
+    if max_length > 3:
+        stripped[too_long] = stripped[too_long].str[:max_length - 3] + "..."
+    else:
+        stripped[too_long] = stripped[too_long].str[:max_length]
+    return stripped
+
+def _truncate_raw(series, max_length):
+    """truncate_field over arbitrary cell values."""
+    blank = ~_truthy(series) | series.isna()
+    return _truncate(_strip(_text(series).mask(blank, "")), max_length)
+
+def _clean_strings(strings):
+    stripped = strings.str.strip()
+    return stripped.mask(stripped.str.lower().isin(BLANK_VALUES), "")
+
+def _clean(series):
+    """clean_value over arbitrary cell values."""
+    return _per_distinct(_text(series), _clean_strings).mask(series.isna(), "")
+
+def _creation_time(value):
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%S+05:30")
+        except ValueError:
+            try:
+                return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                return str(value)
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%dT%H:%M:%S+05:30")
+    return str(value)
+
+def _reformat_date(value, source_format):
+    try:
+        return datetime.strptime(value, source_format).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def _lead_date(series, cleaned, parseable, source_format):
+    """handle_date_fields for one column: parse each distinct parseable string once, fall back to the cleaned value."""
+    dates = cleaned.copy()
+    if parseable.any():
+        parsed = _map_unique(series[parseable], lambda value: _reformat_date(value, source_format))
+        dates[parseable] = parsed.where(parsed.notna(), cleaned[parseable])
+    return dates
+
+def _rows(columns, drop_blank=False):
+    keys = list(columns)
+    values = [column.tolist() if isinstance(column, pd.Series) else column for column in columns.values()]
+    if not drop_blank:
+        return [dict(zip(keys, row)) for row in zip(*values)]
+    # final_data_cleaning: every string column is stripped by now, so blank means "" or None.
+    return [{key: value for key, value in zip(keys, row) if value is not None and value != ""} for row in zip(*values)]
+
+def format_cmda_records(df, now=None):
+    """Columnar legacy_format_record_for_zoho: one CMDA-module payload per row, treating NaN/None cells as absent keys."""
+    if df.empty:
+        return []
+    df = df.reset_index(drop=True)
+    now = now or datetime.now()
+    columns = {}
+
+    dwelling = _column(df, "Dwelling Unit Info")
+    dwelling_text = _strip(_text(dwelling))
+    dwelling_number = _first_number(dwelling_text)
+    has_dwelling = (dwelling.notna() & (dwelling_text != "") & (dwelling_text.str.lower() != "nan")
+                    & dwelling_number.notna())
+    columns["No_of_bathrooms"] = _map_unique(dwelling_number.where(has_dwelling, "0"), lambda number: str(int(number) * 2))
+
+    for excel_field, zoho_field in CMDA_FIELD_MAPPING.items():
+        raw = _column(df, excel_field)
+        present = raw.notna()
+        values = pd.Series("", index=df.index, dtype=object)
+        if not present.any():
+            columns[zoho_field] = values
+            continue
+        raw = raw[present]
+        if excel_field == "Creation_Time":
+            formatted = _memo_map(raw, _creation_time)
+        elif excel_field in ["Dwelling Unit Info", "How_Much_Square_Feet"]:
+            formatted = _first_number(_text(raw)).fillna("0")
+        elif excel_field == "Email ID":
+            email = _strip(_text(raw))
+            valid = email.str.contains("@", regex=False) & email.str.contains(".", regex=False)
+            formatted = email.where(valid, "")
+        elif excel_field == "Mobile No.":
+            formatted = _per_distinct(_text(raw), lambda distinct: distinct.str.strip().str.replace(r'[^\d+]', '', regex=True))
+        else:
+            formatted = _strip(_text(raw))
+        values[present] = formatted
+        columns[zoho_field] = values
+
+    applicant = _column(df, "Applicant Name")
+    company = _column(df, "Company_Name")
+    use_applicant = _truthy(applicant) & applicant.notna()
+    use_company = ~use_applicant & _truthy(company) & company.notna()
+    name = _strip(_text(applicant)).where(use_applicant, _strip(_text(company)).where(use_company, ""))
+    columns["Name"] = _truncate(name, 120).where(name != "", f"Record_{now.strftime('%Y%m%d%H%M%S')}")
+    for field in CMDA_LONG_FIELDS:
+        columns[field] = _truncate(columns[field], 255)
+    columns["Lead_Source"] = ["Digital Leads"] * len(df)
+    return _rows(columns)
+
+def build_lead_records(df, crm, errors=None):
+    """Columnar legacy_build_lead_data: one Leads payload per row of df (NaN cells kept, as in to_dict('records')).
+
+    Rows that legacy_build_lead_data would raise on come back as None, with the exception in errors[row].
+    """
+    if df.empty:
+        return []
+    df = df.reset_index(drop=True)
+    errors = {} if errors is None else errors
+    user_ids = crm.sales_person_user_ids()
+    columns = {}
+
+    architect = (_text(_column(df, "Architect Name", "")) + " " + _text(_column(df, "Architect Address", "")) + " "
+                 + _text(_column(df, "Architect Email", "")))
+    architect = _truncate(_per_distinct(architect, lambda distinct: distinct.str.replace("nan", "", regex=False).str.strip()), 255)
+
+    dwelling = _column(df, "Dwelling Unit Info", "")
+    square_feet = _first_number(_text(dwelling)).fillna("0")
+    square_feet = _map_unique(square_feet, lambda number: str(int(number) * 1000))
+
+    sales_person = _column(df, "Sales Person", "")
+    has_sales_person = _truthy(sales_person) & (_clean(sales_person) != "")
+    owners = [None] * len(df)
+    if has_sales_person.any():
+        found = _memo_map(sales_person[has_sales_person], lambda value: user_ids.get(value.strip()), errors)
+        for position, owner_id in zip(found.index, found.tolist()):
+            # final_data_cleaning drops a blank Owner, so treat it like a missing mapping.
+            owners[position] = owner_id if owner_id and owner_id.strip() else None
+
+    applicant = _column(df, "Applicant Name", "")
+    names = _memo_map(applicant, crm.split_applicant_name, errors)
+    first_names = pd.Series([name[0] if name else "" for name in names.tolist()], index=df.index, dtype=object)
+    last_names = pd.Series([name[1] if name else "" for name in names.tolist()], index=df.index, dtype=object)
+
+    columns["Planning_Permission_No"] = _truncate(_clean(_column(df, "Planning Permission No.", "")), 120)
+    columns["Email"] = _clean(_column(df, "Email ID", ""))
+    columns["Phone"] = _clean(_column(df, "Mobile No.", ""))
+    columns["Company"] = _truncate_raw(applicant, 120)
+    columns["First_Name"] = _truncate(_strip(first_names), 40)
+    columns["Last_Name"] = _truncate(_strip(last_names), 80)
+    columns["Nature_of_Development"] = _truncate(_clean(_column(df, "Nature of Development", "")), 255)
+    columns["Area_Name"] = _truncate(_clean(_column(df, "Area Name", "")), 120)
+    columns["Site_Address"] = _truncate(_clean(_column(df, "Site Address", "")), 255)
+    columns["Reference"] = ["Digital Lead Abhishek"] * len(df)
+    columns["Architect_Name"] = architect
+    columns["Architect_Phone"] = _truncate_raw(_column(df, "Architect Mobile", LEAD_FIELD_DEFAULTS["Architect Mobile"]), 30)
+    columns["Lead_Source"] = ["Digital Leads"] * len(df)
+    columns["How_Much_Square_Feet"] = square_feet
+    columns["Billing_Area"] = _truncate(_clean(_column(df, "Applicant Address", "")), 255)
+    columns["Owner"] = owners
+
+    dwelling = _column(df, "Dwelling Unit Info", "0")
+    units = _first_number(_text(dwelling))
+    units = units.where(_truthy(dwelling) & (_clean(dwelling) != "") & units.notna(), "0")
+    units = _map_unique(units, int)
+    columns["No_of_Bathrooms"] = [unit * 2 for unit in units.tolist()]
+    columns["No_of_Units"] = units
+
+    which_brand = _column(df, "Which_Brand_Looking_for", "")
+    cleaned_brand = _clean(which_brand)
+    columns["Which_Brand_Looking_for"] = _truncate(cleaned_brand, 120).where(_truthy(which_brand) & (cleaned_brand != ""), "")
+    columns["Future_Projects"] = ["-None-"] * len(df)
+
+    date_of_permit = _column(df, "Date of permit", "")
+    cleaned_permit = _clean(date_of_permit)
+    is_string = pd.Series([isinstance(value, str) for value in date_of_permit.tolist()], index=df.index, dtype=bool)
+    parseable = is_string & (_text(date_of_permit).str.len() == 10) & _text(date_of_permit).str.contains("-", regex=False)
+    permit_dates = _lead_date(date_of_permit, cleaned_permit, parseable, "%d-%m-%Y")
+    columns["Date_of_Permit"] = permit_dates.where(_truthy(date_of_permit) & (cleaned_permit != ""), "")
+
+    date_of_application = _column(df, "Date of Application", "")
+    cleaned_application = _clean(date_of_application)
+    is_string = pd.Series([isinstance(value, str) for value in date_of_application.tolist()], index=df.index, dtype=bool)
+    parseable = is_string & _text(date_of_application).str.contains("/", regex=False)
+    application_dates = _lead_date(date_of_application, cleaned_application, parseable, "%d/%m/%Y")
+    columns["Date_of_Application"] = application_dates.where(_truthy(date_of_application) & (cleaned_application != ""), "")
+
+    leads = _rows(columns, drop_blank=True)
+    for position in errors:
+        leads[position] = None
+    return leads
@@ -0,0 +1,109 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ZOHO_PUSH_CONCURRENCY = int(os.getenv("ZOHO_PUSH_CONCURRENCY", "4"))
+ZOHO_MAX_RATE_LIMIT_RETRIES = int(os.getenv("ZOHO_MAX_RATE_LIMIT_RETRIES", "5"))
+ZOHO_RATE_LIMIT_LOW_WATERMARK = int(os.getenv("ZOHO_RATE_LIMIT_LOW_WATERMARK", "5"))
+ZOHO_RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("ZOHO_RATE_LIMIT_BACKOFF_SECONDS", "2"))
+
+def seconds_until_reset(value, now=None):
+    """Zoho sends X-RATELIMIT-RESET either as seconds to wait or as an epoch timestamp (s or ms)."""
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    if reset > 1e12:
+        reset /= 1000
+    if reset > 1e9:
+        return max(0.0, reset - now)
+    return max(0.0, reset)
+
+class ZohoPushScheduler:
+
+    def __init__(self, concurrency=ZOHO_PUSH_CONCURRENCY, max_retries=ZOHO_MAX_RATE_LIMIT_RETRIES,
+                 low_watermark=ZOHO_RATE_LIMIT_LOW_WATERMARK):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.low_watermark = low_watermark
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.stats = {}
+
+    def _pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def _wait_turn(self):
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.time()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def _observe(self, response, attempt):
+        headers = response.headers
+        reset_seconds = seconds_until_reset(headers.get('X-RATELIMIT-RESET'))
+        if response.status_code == 429:
+            retry_after = headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                wait = float(retry_after)
+            elif reset_seconds is not None:
+                wait = reset_seconds
+            else:
+                wait = random.uniform(0, ZOHO_RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt))
+            print(f"⏳ Zoho rate limit hit, pausing pushes for {wait:.1f}s")
+            self._pause(wait)
+            return
+        remaining = headers.get('X-RATELIMIT-REMAINING')
+        if remaining is not None and remaining.isdigit() and int(remaining) <= self.low_watermark and reset_seconds:
+            self._pause(reset_seconds)
+
+    def _record(self, module, records, started, finished):
+        with self.lock:
+            module_stats = self.stats.setdefault(module, {'requests': 0, 'records': 0, 'first_started': started, 'last_finished': finished})
+            module_stats['requests'] += 1
+            module_stats['records'] += records
+            module_stats['first_started'] = min(module_stats['first_started'], started)
+            module_stats['last_finished'] = max(module_stats['last_finished'], finished)
+
+    def send(self, module, send_function, record_count):
+        """Call send_function() under the shared concurrency limit, retrying 429s once Zoho allows it."""
+        with self.slots:
+            started = time.time()
+            attempt = 0
+            while True:
+                self._wait_turn()
+                response = send_function()
+                self._observe(response, attempt)
+                if response.status_code != 429 or attempt >= self.max_retries:
+                    break
+                attempt += 1
+            self._record(module, record_count, started, time.time())
+            return response
+
+    def map(self, function, batches):
+        """Run function over batches concurrently, returning results in batch order."""
+        if len(batches) <= 1:
+            return [function(batch) for batch in batches]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+            return list(executor.map(function, batches))
+
+    def throughput(self):
+        with self.lock:
+            stats = {module: dict(module_stats) for module, module_stats in self.stats.items()}
+        report = {}
+        for module, module_stats in stats.items():
+            seconds = max(module_stats['last_finished'] - module_stats['first_started'], 1e-6)
+            report[module] = {
+                'requests': module_stats['requests'],
+                'records': module_stats['records'],
+                'seconds': round(seconds, 2),
+                'records_per_second': round(module_stats['records'] / seconds, 2)
+            }
+        return report